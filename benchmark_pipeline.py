@@ -0,0 +1,367 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_errors
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from core.ocr_cache import file_sha256
+
+try:
+    import resource  # Hanya tersedia di Unix
+except ImportError:
+    resource = None
+
+# Benchmark harus jalan di mesin CPU-only tanpa jaringan
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+ROOT = Path(__file__).resolve().parent
+CORPUS_FILE = ROOT / "benchmark_corpus.json"
+# Batas waktu satu stage (semua pengulangan); stage yang macet/crash dicatat gagal
+STAGE_TIMEOUT = float(os.environ.get("BENCH_STAGE_TIMEOUT", "1800"))
+
+
+class SkipStage(Exception):
+    """Stage tidak bisa dijalankan di lingkungan ini (mis. model/OCR belum terpasang)"""
+
+
+# ==========================================
+# 1. KORPUS (subset data_input yang dipin + checksum)
+# ==========================================
+def load_corpus(corpus_file=CORPUS_FILE):
+    """Baca daftar PDF benchmark dan pastikan isinya tidak berubah sejak dipin"""
+    with open(corpus_file, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    pdfs = []
+    for item in corpus["files"]:
+        path = ROOT / item["path"]
+        if not path.exists():
+            raise SystemExit(f"[ERROR] File korpus tidak ditemukan: {item['path']}")
+        if file_sha256(path) != item["sha256"]:
+            raise SystemExit(f"[ERROR] Checksum berubah: {item['path']} (jalankan --pin jika memang disengaja)")
+        pdfs.append(path)
+    return pdfs
+
+def pin_corpus(paths, corpus_file=CORPUS_FILE):
+    files = [{"path": Path(p).as_posix(), "sha256": file_sha256(ROOT / p)} for p in paths]
+    with open(corpus_file, 'w', encoding='utf-8') as f:
+        json.dump({"files": files}, f, indent=4, ensure_ascii=False)
+    print(f"[INFO] {len(files)} file dipin ke {corpus_file}")
+
+
+# ==========================================
+# 2. STAGE
+# ==========================================
+# Setiap stage = fungsi setup(pdfs, workdir) yang mengembalikan callable run().
+# Hanya run() yang diukur; persiapan input stage (mis. ekstraksi teks) ada di setup.
+
+def _document_lines(pdfs, backend="pdfplumber"):
+    from core.text_backend import get_text_backend
+    text_backend = get_text_backend(backend)
+    return {pdf: list(text_backend.iter_pages(pdf)) for pdf in pdfs}
+
+def stage_pdf_open(pdfs, workdir):
+    import fitz
+    import pdfplumber
+
+    def run():
+        for pdf in pdfs:
+            with pdfplumber.open(pdf) as doc:
+                len(doc.pages)
+            with fitz.open(pdf) as doc:
+                len(doc)
+    return run
+
+def make_stage_text_extraction(backend):
+    def stage(pdfs, workdir):
+        from core.text_backend import get_text_backend
+        text_backend = get_text_backend(backend)
+
+        def run():
+            for pdf in pdfs:
+                for _ in text_backend.iter_pages(pdf):
+                    pass
+        return run
+    return stage
+
+def stage_language_detection(pdfs, workdir):
+    from main_normalization import detect_language_from_text
+    samples = []
+    for pages in _document_lines(pdfs, "pymupdf").values():
+        samples.append(" ".join(text for page_num, text, _ in pages if page_num <= 2 and text))
+
+    def run():
+        for sample in samples:
+            detect_language_from_text(sample)
+    return run
+
+def stage_keyword_match(pdfs, workdir):
+    from core.keyword_matcher import KeywordMatcher
+    from main_normalization import MY_SCHEMA_LABELS
+    matcher = KeywordMatcher(MY_SCHEMA_LABELS)
+    lines = [line["text"] for pages in _document_lines(pdfs).values() for _, _, page_lines in pages for line in page_lines]
+
+    def run():
+        for line in lines:
+            matcher.scan(line)
+    return run
+
+def stage_embedding(pdfs, workdir):
+    from main_normalization import MODEL_NAME, HEADING_MAX_LEN
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME, device="cpu")
+    except Exception as e:
+        raise SkipStage(f"model tidak tersedia: {type(e).__name__}")
+    lines = [line["text"].strip() for pages in _document_lines(pdfs).values() for _, _, page_lines in pages for line in page_lines]
+    lines = [line for line in lines if 5 <= len(line) < HEADING_MAX_LEN]
+
+    def run():
+        model.encode(lines, batch_size=64, convert_to_tensor=True)
+    return run
+
+def stage_table_detection(pdfs, workdir):
+    import pdfplumber
+    from core.cell_index import index_tables
+    docs = [pdfplumber.open(pdf) for pdf in pdfs]
+    for doc in docs:
+        for page in doc.pages:
+            page.chars  # Parsing karakter dihitung di stage ekstraksi, bukan di sini
+
+    def run():
+        for doc in docs:
+            for page in doc.pages:
+                tables = page.find_tables()
+                if not tables: continue
+                cell_index = index_tables(page, tables)
+                for cell_bbox in cell_index.cells:
+                    cell_index.text(cell_bbox)
+    return run
+
+def stage_ocr(pdfs, workdir, pages_per_pdf=1):
+    import importlib.util
+    if importlib.util.find_spec("paddleocr") is None:
+        raise SkipStage("OCR tidak tersedia: paddleocr belum terpasang")
+    from core.extractor import PDFExtractor
+    from core.ocr_pool import warm_up_ocr
+    warm_up_ocr(lang='id')  # Waktu muat model tidak ikut diukur
+    # Tanpa cache OCR: pengulangan harus benar-benar menjalankan OCR
+    extractors = [PDFExtractor(str(pdf), cache=False) for pdf in pdfs]
+
+    def run():
+        for extractor in extractors:
+            for page_num in range(min(pages_per_pdf, len(extractor.doc))):
+                extractor.process_single_page(page_num)
+    return run
+
+def stage_page_classification(pdfs, workdir):
+    import fitz
+    from core.extractor import choose_page_source, page_text_quality
+    docs = [fitz.open(pdf) for pdf in pdfs]
+
+    def run():
+        for doc in docs:
+            for page in doc:
+                choose_page_source(page_text_quality(page))
+    return run
+
+def stage_output_writing(pdfs, workdir):
+    from core.keyword_matcher import KeywordMatcher
+    from main_normalization import MY_SCHEMA_LABELS
+    matcher = KeywordMatcher(MY_SCHEMA_LABELS)
+
+    # Dokumen output berbentuk sama dengan hasil normalisasi (section via keyword saja)
+    documents = {}
+    for pdf, pages in _document_lines(pdfs).items():
+        content, current = {}, None
+        for _, _, page_lines in pages:
+            for line in page_lines:
+                current = matcher.match(line["text"]) or current
+                if current:
+                    content.setdefault(current, []).append(line["text"])
+        documents[pdf] = {
+            "metadata": {"file_name": pdf.name},
+            "content": {key: " ".join(chunks) + " " for key, chunks in content.items()},
+        }
+
+    def run():
+        for pdf, document in documents.items():
+            with open(Path(workdir) / f"{pdf.stem}.json", 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=4, ensure_ascii=False)
+    return run
+
+STAGES = {
+    "normalization/pdf_open": stage_pdf_open,
+    "normalization/text_extraction[pdfplumber]": make_stage_text_extraction("pdfplumber"),
+    "normalization/text_extraction[pymupdf]": make_stage_text_extraction("pymupdf"),
+    "normalization/language_detection": stage_language_detection,
+    "normalization/keyword_match": stage_keyword_match,
+    "normalization/embedding": stage_embedding,
+    "normalization/output_writing": stage_output_writing,
+    "visual/table_detection": stage_table_detection,
+    "extractor/page_classification": stage_page_classification,
+    "extractor/ocr": stage_ocr,
+}
+
+
+# ==========================================
+# 3. PENGUKURAN (satu proses baru per stage agar peak RSS tidak tercampur)
+# ==========================================
+def _peak_rss_mb():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: byte
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def _run_stage_child(stage_name, pdf_paths, repeat, queue):
+    sys.path.insert(0, str(ROOT))
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            run = STAGES[stage_name]([Path(p) for p in pdf_paths], workdir)
+            rss_before = _peak_rss_mb()
+            runs = []
+            for _ in range(repeat):
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                run()
+                runs.append({"wall_seconds": time.perf_counter() - wall_start,
+                             "cpu_seconds": time.process_time() - cpu_start})
+            queue.put({
+                "wall_seconds": round(statistics.median(r["wall_seconds"] for r in runs), 4),
+                "cpu_seconds": round(statistics.median(r["cpu_seconds"] for r in runs), 4),
+                "peak_rss_mb": _peak_rss_mb(),
+                "rss_after_setup_mb": rss_before,
+                "runs": runs,
+            })
+    except SkipStage as e:
+        queue.put({"skipped": str(e)})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+def _wait_stage(proc, queue, timeout):
+    """Hasil stage dari proses anak; error jika proses mati tanpa hasil atau melewati timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1.0)
+        except queue_errors.Empty:
+            pass
+        if proc.exitcode is not None:
+            # Hasil bisa saja baru masuk tepat sebelum proses selesai
+            try:
+                return queue.get(timeout=1.0)
+            except queue_errors.Empty:
+                return {"error": f"proses stage berhenti tanpa hasil (exit code {proc.exitcode})"}
+        if time.monotonic() > deadline:
+            proc.terminate()
+            return {"error": f"timeout setelah {timeout:.0f} s"}
+
+def run_benchmark(output_file, repeat=3, stages=None, timeout=STAGE_TIMEOUT):
+    pdfs = load_corpus()
+    stage_names = stages or list(STAGES)
+    ctx = multiprocessing.get_context("spawn")
+
+    results = {}
+    for name in stage_names:
+        print(f"[BENCH] {name} ...", flush=True)
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_stage_child, args=(name, [str(p) for p in pdfs], repeat, queue))
+        proc.start()
+        result = _wait_stage(proc, queue, timeout)
+        proc.join(5)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+        results[name] = {"pipeline": name.split("/")[0], **result}
+
+        if "skipped" in result:
+            print(f"        dilewati: {result['skipped']}")
+        elif "error" in result:
+            print(f"        error: {result['error']}")
+        else:
+            print(f"        wall {result['wall_seconds']:.3f}s | cpu {result['cpu_seconds']:.3f}s | peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": [p.relative_to(ROOT).as_posix() for p in pdfs],
+        "repeat": repeat,
+        "stages": results,
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"\n[INFO] Hasil benchmark disimpan di: {output_file}")
+    return report
+
+
+# ==========================================
+# 4. COMPARE (deteksi regresi terhadap baseline)
+# ==========================================
+def compare_results(baseline_file, current_file, threshold=0.15, min_seconds=0.05):
+    """Tandai stage yang lebih lambat/boros memori dari baseline. Return jumlah regresi."""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)["stages"]
+    with open(current_file, 'r', encoding='utf-8') as f:
+        current = json.load(f)["stages"]
+
+    regressions = 0
+    print(f"{'STAGE':<45} | {'BASELINE':>9} | {'SEKARANG':>9} | {'DELTA':>7} | STATUS")
+    print("-" * 90)
+    for name in sorted(set(baseline) | set(current)):
+        base, cur = baseline.get(name, {}), current.get(name, {})
+        if "wall_seconds" in base and "error" in cur:
+            regressions += 1
+            print(f"{name:<45} | {base['wall_seconds']:>8.3f}s | {'-':>9} | {'-':>7} | GAGAL ({cur['error']})")
+            continue
+        if "wall_seconds" not in base or "wall_seconds" not in cur:
+            print(f"{name:<45} | {'-':>9} | {'-':>9} | {'-':>7} | tidak dibandingkan")
+            continue
+
+        delta = (cur["wall_seconds"] - base["wall_seconds"]) / base["wall_seconds"] if base["wall_seconds"] else 0.0
+        status = "OK"
+        if delta > threshold and cur["wall_seconds"] - base["wall_seconds"] > min_seconds:
+            status = "REGRESI (waktu)"
+        if base.get("peak_rss_mb") and cur.get("peak_rss_mb") and cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            status = "REGRESI (memori)" if status == "OK" else status + " + memori"
+        if status != "OK":
+            regressions += 1
+        print(f"{name:<45} | {base['wall_seconds']:>8.3f}s | {cur['wall_seconds']:>8.3f}s | {delta:>+6.0%} | {status}")
+
+    print(f"\n[INFO] {regressions} regresi (ambang {threshold:.0%})")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per stage untuk pipeline normalisasi, visual, dan OCR")
+    parser.add_argument("--output", default="benchmark_results.json", help="File hasil benchmark (JSON)")
+    parser.add_argument("--repeat", type=int, default=3, help="Jumlah pengulangan per stage (median)")
+    parser.add_argument("--stage", action="append", choices=list(STAGES), help="Hanya jalankan stage ini (boleh berulang)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Jalankan benchmark baru ke --output lalu bandingkan dengan baseline tersimpan")
+    parser.add_argument("--current", metavar="RESULTS",
+                        help="Dengan --compare: bandingkan file hasil ini tanpa menjalankan benchmark")
+    parser.add_argument("--timeout", type=float, default=STAGE_TIMEOUT, help="Batas waktu per stage (detik)")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Ambang regresi relatif (0.15 = 15%%)")
+    parser.add_argument("--pin", nargs="+", metavar="PDF", help="Pin ulang korpus benchmark dengan daftar PDF ini")
+    args = parser.parse_args()
+
+    if args.pin:
+        pin_corpus(args.pin)
+    elif args.compare:
+        current = args.current
+        if current is None:
+            run_benchmark(args.output, repeat=args.repeat, stages=args.stage, timeout=args.timeout)
+            current = args.output
+        sys.exit(1 if compare_results(args.compare, current, threshold=args.threshold) else 0)
+    else:
+        run_benchmark(args.output, repeat=args.repeat, stages=args.stage, timeout=args.timeout)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Modul berat yang dicek: apakah sudah ikut ter-import hanya karena import entry point
+HEAVY_MODULES = ["torch", "sentence_transformers", "langdetect", "paddleocr", "pdfplumber", "fitz", "docx"]
+
+# Entry point: kode import + kode inisialisasi yang dijalankan scheduler sebelum PDF pertama disentuh
+ENTRY_POINTS = {
+    "main_normalization": {
+        "import": "import main_normalization as m",
+        "init": "m.SemanticNormalizer(m.MY_SCHEMA_LABELS)",
+    },
+    "visual_reconstruct_pro": {
+        "import": "import visual_reconstruct_pro as m",
+        "init": "m.VisualNormalizer(m.MY_SCHEMA_LABELS)",
+    },
+    "discovery_engine": {
+        "import": "import discovery_engine as m",
+        "init": None,
+    },
+    "core.extractor": {
+        "import": "import core.extractor as m",
+        "init": None,
+    },
+}
+
+# Dijalankan di proses Python baru agar tidak ada modul yang sudah ter-cache
+PROBE = r'''
+import contextlib, io, json, sys, time
+result = {{}}
+t0 = time.perf_counter()
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        {import_code}
+    result["import_seconds"] = time.perf_counter() - t0
+    result["heavy_loaded_after_import"] = [name for name in {heavy!r} if name in sys.modules]
+except Exception as e:
+    result["error"] = f"import: {{type(e).__name__}}: {{str(e).splitlines()[0] if str(e) else ''}}"
+if "error" not in result and {init_code!r}:
+    t1 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            exec({init_code!r})
+        result["init_seconds"] = time.perf_counter() - t1
+    except Exception as e:
+        result["error"] = f"init: {{type(e).__name__}}: {{str(e).splitlines()[0] if str(e) else ''}}"
+print(json.dumps(result))
+'''
+
+def probe(import_code, init_code):
+    code = PROBE.format(import_code=import_code, init_code=init_code, heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          cwd=Path(__file__).resolve().parent)
+    lines = proc.stdout.strip().splitlines()
+    if not lines:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "tidak ada output"}
+    return json.loads(lines[-1])
+
+def run_startup_benchmark(repeat=3, output_file=None):
+    report = {}
+    for name, entry in ENTRY_POINTS.items():
+        runs = [probe(entry["import"], entry["init"]) for _ in range(repeat)]
+        ok_runs = [run for run in runs if "import_seconds" in run]
+        item = {"runs": len(runs)}
+        if ok_runs:
+            item["import_seconds"] = round(statistics.median(run["import_seconds"] for run in ok_runs), 4)
+            item["heavy_loaded_after_import"] = ok_runs[-1]["heavy_loaded_after_import"]
+            if entry["init"]:
+                init_runs = [run["init_seconds"] for run in ok_runs if "init_seconds" in run]
+                item["init_seconds"] = round(statistics.median(init_runs), 4) if init_runs else None
+        errors = sorted({run["error"] for run in runs if "error" in run})
+        if errors:
+            item["errors"] = errors
+        report[name] = item
+
+    print(f"{'ENTRY POINT':<36} | {'IMPORT (s)':>10} | {'INIT (s)':>10} | MODUL BERAT TER-IMPORT")
+    print("-" * 100)
+    for name, item in report.items():
+        import_s = f"{item['import_seconds']:.3f}" if "import_seconds" in item else "-"
+        init_s = f"{item['init_seconds']:.3f}" if item.get("init_seconds") is not None else "-"
+        heavy = ", ".join(item.get("heavy_loaded_after_import", [])) or "-"
+        print(f"{name:<36} | {import_s:>10} | {init_s:>10} | {heavy}")
+        for error in item.get("errors", []):
+            print(f"{'':<36}   [ERROR] {error}")
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\n[INFO] Hasil disimpan di: {output_file}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark waktu import & inisialisasi tiap entry point")
+    parser.add_argument("--repeat", type=int, default=3, help="Jumlah pengulangan per entry point (median)")
+    parser.add_argument("--output", default=None, help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+    run_startup_benchmark(repeat=args.repeat, output_file=args.output)
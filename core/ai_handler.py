@@ -1,23 +1,298 @@
 # Lokasi: core/ai_handler.py
-import requests
 import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.llm import OLLAMA_URL, IncrementalJSON, ollama_generate, ollama_stream
+from core.llm_scheduler import INTERACTIVE
+from core.metrics import get_logger
+from core.retrieval import TOKEN_BUDGET, TOP_K, estimate_tokens, get_document_index
+
+log = get_logger("ai")
+
+DEFAULT_URL = OLLAMA_URL
+# Ganti llama3 menjadi phi3 agar tidak berat di RAM
+DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL", "phi3")
+# Jumlah thread pemetaan per pemanggilan; batas total request ke Ollama (semua pengguna
+# dalam proses ini) diatur scheduler LLM lewat OLLAMA_CONCURRENCY
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4"))
+# >1: beberapa sub-bab diminta dalam satu prompt (jawaban JSON), konteks cukup dikirim sekali per grup
+DEFAULT_CHAPTERS_PER_PROMPT = int(os.environ.get("AI_CHAPTERS_PER_PROMPT", "1"))
+# 0: kembali ke cara lama (potongan awal dokumen, tanpa retrieval)
+DEFAULT_RETRIEVAL = os.environ.get("AI_RETRIEVAL", "1") == "1"
+
+MAX_CONTEXT_CHARS = 5000
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 120
+EMPTY = "KOSONG"
+
+# Struktur standar manual book: bab -> sub-bab (label sama dengan TRANSLATION_MAP di main_normalization.py)
+CHAPTER_STRUCTURE = {
+    "1. Tujuan Penggunaan & Panduan Keamanan": [
+        "1.1 Tujuan Produk/Definisi", "1.2 Panduan Keamanan", "1.3 Penjelasan Simbol", "1.4 Singkatan"],
+    "2. Instalasi": ["2.0 Instalasi"],
+    "3. Panduan Operasional & Pemantauan Klinis": [
+        "3.1 Antarmuka Pengguna", "3.2 Overview", "3.3 Manajemen Pengguna", "3.4 Prosedur Pemantauan",
+        "3.5 Perhitungan Medis", "3.6 Manajemen Rekaman & Tinjauan Hasil"],
+    "4. Perawatan, Pemeliharaan & Pembersihan": [
+        "4.1 Inspeksi Umum", "4.2 Pemeliharaan", "4.3 Perawatan", "4.4 Pembersihan"],
+    "5. Pemecahan Masalah": ["5.0 Pemecahan Masalah"],
+    "6. Spesifikasi Teknis & Kepatuhan Standar": ["6.1 Spesifikasi", "6.2 Kepatuhan Standar"],
+    "7. Garansi & Layanan": ["7.1 Garansi", "7.2 Informasi Kontak"],
+}
+
+# Kata kunci query retrieval per sub-bab (ringkasan keywords MY_SCHEMA_LABELS di main_normalization.py)
+CHAPTER_KEYWORDS = {
+    "1.1 Tujuan Produk/Definisi": "tujuan produk definisi intended use product overview",
+    "1.2 Panduan Keamanan": "keamanan safety guidelines warning caution peringatan",
+    "1.3 Penjelasan Simbol": "simbol explanation of symbols simbol alat",
+    "1.4 Singkatan": "singkatan abbreviations daftar singkatan",
+    "2.0 Instalasi": "instalasi pemasangan setup unboxing",
+    "3.1 Antarmuka Pengguna": "user interface display tampilan layar tombol",
+    "3.2 Overview": "overview gambaran umum accessories aksesoris controls",
+    "3.3 Manajemen Pengguna": "manajemen pengguna data pengguna patient record user management data pasien",
+    "3.4 Prosedur Pemantauan": "prosedur pemantauan monitoring procedure langkah pemantauan",
+    "3.5 Perhitungan Medis": "medical calculation perhitungan medis kalkulasi dosis",
+    "3.6 Manajemen Rekaman & Tinjauan Hasil": "manajemen rekaman tinjauan hasil historical data logbook",
+    "4.1 Inspeksi Umum": "inspeksi umum general inspection pemeriksaan fisik",
+    "4.2 Pemeliharaan": "maintenance pemeliharaan kalibrasi servis berkala suku cadang",
+    "4.3 Perawatan": "perawatan care of device penyimpanan storage penanganan alat",
+    "4.4 Pembersihan": "pembersihan cleaning disinfection sterilisasi",
+    "5.0 Pemecahan Masalah": "troubleshooting error codes solusi masalah",
+    "6.1 Spesifikasi": "spesifikasi specification technical data berat dimensi daya",
+    "6.2 Kepatuhan Standar": "IEC EMC ISO standar kepatuhan",
+    "7.1 Garansi": "garansi warranty purna jual",
+    "7.2 Informasi Kontak": "kontak service contact layanan pelanggan telepon alamat",
+}
+
+def chapter_query(title):
+    return f"{title} {CHAPTER_KEYWORDS.get(title, '')}".strip()
+
 
 class AIHandler:
-    def __init__(self):
-        self.url = "http://localhost:11434/api/generate"
-        # Ganti llama3 menjadi phi3 agar tidak berat di RAM
-        self.model = "phi3" 
+    def __init__(self, url=DEFAULT_URL, model=DEFAULT_MODEL, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 chapters_per_prompt=DEFAULT_CHAPTERS_PER_PROMPT, bypass_cache=False,
+                 retrieval=DEFAULT_RETRIEVAL, top_k=TOP_K, token_budget=TOKEN_BUDGET, priority=INTERACTIVE):
+        self.url = url
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.chapters_per_prompt = max(1, chapters_per_prompt)
+        # True: selalu tanya model, abaikan jawaban yang ada di cache LLM
+        self.bypass_cache = bypass_cache
+        # Lane scheduler LLM: INTERACTIVE (Streamlit) atau BATCH (job massal)
+        self.priority = priority
+        # Retrieval: setiap prompt hanya membawa top-k chunk yang relevan (maks. token_budget per sub-bab)
+        self.retrieval = retrieval
+        self.top_k = top_k
+        self.token_budget = token_budget
+        # Durasi (detik) per sub-bab dari pemanggilan map_content_to_chapters terakhir
+        self.last_timings = {}
+        # Detik sampai teks pertama tiap sub-bab muncul (yang dirasakan pengguna sebagai "cepat")
+        self.last_first_output = {}
+
+        # Satu session untuk semua request: koneksi TCP ke Ollama dipakai ulang (keep-alive)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _generate(self, prompt, fmt=None):
+        """Satu request ke /api/generate (lewat cache LLM); error jaringan/HTTP dilempar ke pemanggil"""
+        params = {"format": fmt} if fmt else {}
+        return ollama_generate(prompt, self.model, url=self.url, session=self.session,
+                               timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), bypass=self.bypass_cache,
+                               priority=self.priority, **params)
+
+    def _stream(self, prompt, fmt=None):
+        """Seperti _generate, tetapi yield potongan teks selama model menjawab"""
+        params = {"format": fmt} if fmt else {}
+        return ollama_stream(prompt, self.model, url=self.url, session=self.session,
+                             timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), bypass=self.bypass_cache,
+                             priority=self.priority, **params)
 
-    def get_single_chapter(self, chapter_title, text_context):
-        # Kita kurangi konteks teks sedikit agar proses lebih ringan
+    def get_single_chapter(self, chapter_title, text_context, on_partial=None):
+        """Isi satu sub-bab dari text_context (konteks hasil select_contexts, dikirim apa adanya).
+        Dengan on_partial(judul, teks), jawaban di-stream dan teks parsial dikirim setiap ada potongan baru."""
         prompt = f"""
         Identifikasi informasi untuk "{chapter_title}" dari teks di bawah.
-        Salin teks asli tanpa diringkas. Jika tidak ada, isi "KOSONG".
-        Data: {text_context[:5000]}
+        Salin teks asli tanpa diringkas. Jika tidak ada, isi "{EMPTY}".
+        Data: {text_context}
+        """
+        try:
+            if on_partial is None:
+                return self._generate(prompt) or EMPTY
+            parts = []
+            for piece in self._stream(prompt):
+                parts.append(piece)
+                on_partial(chapter_title, "".join(parts).strip())
+            return "".join(parts).strip() or EMPTY
+        except Exception:
+            return EMPTY
+
+    def get_chapters(self, chapter_titles, text_context, on_partial=None):
+        """Beberapa sub-bab dalam satu prompt. Jawaban JSON {judul: isi}; sub-bab yang
+        tidak ada di jawaban (atau JSON tidak valid) diminta ulang satu per satu.
+        Saat streaming, JSON parsial di-parse sehingga tiap sub-bab terisi bertahap."""
+        titles = "\n".join(f'- "{title}"' for title in chapter_titles)
+        prompt = f"""
+        Identifikasi informasi untuk setiap judul berikut dari teks di bawah:
+        {titles}
+        Salin teks asli tanpa diringkas. Jika tidak ada, isi "{EMPTY}".
+        Jawab HANYA dengan JSON: {{"<judul>": "<isi>"}}
+        Data: {text_context}
         """
-        payload = {"model": self.model, "prompt": prompt, "stream": False}
         try:
-            response = requests.post(self.url, json=payload, timeout=120)
-            return response.json().get('response', 'KOSONG').strip()
-        except:
-            return "KOSONG"
\ No newline at end of file
+            if on_partial is None:
+                answer = json.loads(self._generate(prompt, fmt="json"))
+            else:
+                parser = IncrementalJSON()
+                shown = {}
+                for piece in self._stream(prompt, fmt="json"):
+                    partial = parser.feed(piece)
+                    if not isinstance(partial, dict): continue
+                    for title in chapter_titles:
+                        content = partial.get(title)
+                        if isinstance(content, str) and content != shown.get(title):
+                            shown[title] = content
+                            on_partial(title, content.strip())
+                answer = json.loads(parser.text)
+        except Exception:
+            answer = {}
+        if not isinstance(answer, dict):
+            answer = {}
+
+        result = {}
+        for title in chapter_titles:
+            content = answer.get(title)
+            if isinstance(content, str) and content.strip():
+                result[title] = content.strip()
+            else:
+                result[title] = self.get_single_chapter(title, text_context, on_partial)
+        return result
+
+    def select_contexts(self, text_context, groups):
+        """Konteks per grup sub-bab. Dokumen yang muat anggaran dikirim utuh; selain itu
+        chunk paling relevan dari seluruh dokumen (bukan hanya awal dokumen) dipilih lewat
+        index vektor. Tanpa retrieval (atau jika model embedding tidak tersedia) kembali ke
+        potongan awal MAX_CONTEXT_CHARS. Konteks hasil retrieval tidak dipotong lagi di prompt."""
+        truncated = [text_context[:MAX_CONTEXT_CHARS]] * len(groups)
+        if not self.retrieval:
+            return truncated
+        if estimate_tokens(text_context) <= self.token_budget:
+            return [text_context] * len(groups)
+        try:
+            index = get_document_index(text_context)
+            scores = index.rank([chapter_query(title) for group in groups for title in group])
+        except Exception as e:
+            log.warning(f"[WARN] Retrieval tidak tersedia, memakai awal dokumen: {e}")
+            return truncated
+
+        contexts, row = [], 0
+        for group in groups:
+            contexts.append(index.pack(scores[row:row + len(group)], self.top_k, self.token_budget * len(group)))
+            row += len(group)
+        return contexts
+
+    def iter_chapters(self, text_context, chapters=None, max_concurrency=None, chapters_per_prompt=None,
+                      stream=True):
+        """Generator event {"title", "text", "done", "seconds"} selama sub-bab dipetakan.
+
+        Request berjalan di thread pool (maks. `max_concurrency`), tetapi event di-yield
+        di thread pemanggil, jadi aman untuk langsung menulis ke UI Streamlit. Event
+        parsial yang menumpuk digabung (hanya teks terbaru per sub-bab yang dikirim).
+        `seconds` dihitung dari awal prompt sub-bab tersebut.
+        """
+        chapters = chapters or CHAPTER_STRUCTURE
+        max_concurrency = max(1, max_concurrency or self.max_concurrency)
+        per_prompt = max(1, chapters_per_prompt or self.chapters_per_prompt)
+
+        titles = [title for subs in chapters.values() for title in subs]
+        groups = [titles[i:i + per_prompt] for i in range(0, len(titles), per_prompt)]
+        contexts = self.select_contexts(text_context, groups)
+        events = queue.Queue()
+        cancelled = threading.Event()
+
+        def run(group, context):
+            if cancelled.is_set():
+                return
+            start = time.perf_counter()
+
+            def on_partial(title, text):
+                if cancelled.is_set():
+                    raise RuntimeError("Pemetaan dibatalkan")
+                events.put({"title": title, "text": text, "done": False, "seconds": time.perf_counter() - start})
+
+            on_partial = on_partial if stream else None
+            try:
+                if len(group) == 1:
+                    contents = {group[0]: self.get_single_chapter(group[0], context, on_partial)}
+                else:
+                    contents = self.get_chapters(group, context, on_partial)
+            except Exception:
+                contents = {title: EMPTY for title in group}
+            # Satu prompt untuk beberapa sub-bab: durasinya dicatat untuk setiap sub-bab di grup
+            elapsed = time.perf_counter() - start
+            for title in group:
+                events.put({"title": title, "text": contents[title], "done": True, "seconds": elapsed})
+
+        executor = ThreadPoolExecutor(min(max_concurrency, max(1, len(groups))), thread_name_prefix="ai-chapter")
+        for group, context in zip(groups, contexts):
+            executor.submit(run, group, context)
+        remaining = len(titles)
+        try:
+            while remaining:
+                latest = {}
+                event = events.get()
+                while True:
+                    latest[event["title"]] = event
+                    try:
+                        event = events.get_nowait()
+                    except queue.Empty:
+                        break
+                for event in latest.values():
+                    if event["done"]:
+                        remaining -= 1
+                    yield event
+        finally:
+            # Consumer berhenti (mis. rerun Streamlit): grup yang belum mulai tidak dikirim
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def map_content_to_chapters(self, text_context, chapters=None, max_concurrency=None,
+                                chapters_per_prompt=None, return_timings=False, on_update=None):
+        """Petakan teks manual ke struktur {bab: {sub_bab: isi}}.
+
+        Sub-bab dikirim paralel (maks. `max_concurrency` request bersamaan), dikelompokkan
+        `chapters_per_prompt` per prompt. Jika `on_update(event)` diberikan, jawaban
+        di-stream dan setiap event iter_chapters diteruskan (di thread pemanggil).
+        Durasi per sub-bab disimpan di self.last_timings, waktu sampai teks pertama
+        muncul di self.last_first_output (timings ikut dikembalikan jika return_timings=True).
+        """
+        chapters = chapters or CHAPTER_STRUCTURE
+        contents, timings, first_output = {}, {}, {}
+        for event in self.iter_chapters(text_context, chapters, max_concurrency, chapters_per_prompt,
+                                        stream=on_update is not None):
+            if on_update is not None:
+                on_update(event)
+            title = event["title"]
+            if event["text"] and title not in first_output:
+                first_output[title] = event["seconds"]
+            if event["done"]:
+                contents[title] = event["text"]
+                timings[title] = event["seconds"]
+
+        self.last_timings = timings
+        self.last_first_output = first_output
+        mapped = {bab: {sub: contents[sub] for sub in subs} for bab, subs in chapters.items()}
+        if return_timings:
+            return mapped, timings
+        return mapped
+
+    def close(self):
+        self.session.close()
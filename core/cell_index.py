@@ -0,0 +1,71 @@
+# Lokasi: core/cell_index.py
+# pdfplumber di-import saat index dipakai, agar import modul ini tetap ringan
+
+# Ukuran sel grid (pt); sel tabel biasa 15-200 pt, jadi satu sel tabel hanya di sedikit bucket
+GRID_SIZE = 24
+
+
+class CellTextIndex:
+    """Teks semua sel tabel di satu halaman pdfplumber dari satu kali lewat karakter.
+
+    Hasilnya sama dengan `page.within_bbox(cell_bbox).extract_text()` per sel:
+    karakter masuk ke sel jika bbox-nya sepenuhnya di dalam sel (urutan karakter
+    halaman dipertahankan), lalu dirangkai dengan textmap pdfplumber yang sama.
+    Bedanya, within_bbox memindai semua karakter halaman untuk setiap sel
+    (sel x karakter), sedangkan di sini sel didaftarkan ke grid seragam dan
+    setiap karakter hanya dicek terhadap sel di bucket pojok kiri-atasnya.
+    """
+
+    def __init__(self, page, cell_bboxes, grid_size=GRID_SIZE):
+        from pdfplumber import utils
+
+        self.page = page
+        self.grid_size = grid_size
+        self.cells = list(dict.fromkeys(bbox for bbox in cell_bboxes if bbox is not None))
+        self._chars = {bbox: [] for bbox in self.cells}
+        self._texts = {}
+
+        grid = {}
+        for bbox in self.cells:
+            for key in self._buckets(bbox):
+                grid.setdefault(key, []).append(bbox)
+
+        # Sel yang memuat penuh sebuah karakter pasti memuat titik (x0, top)-nya
+        for char in page.chars:
+            char_bbox = utils.obj_to_bbox(char)
+            candidates = grid.get(self._bucket(char_bbox[0], char_bbox[1]))
+            if not candidates: continue
+            for bbox in candidates:
+                if utils.get_bbox_overlap(char_bbox, bbox) == char_bbox:
+                    self._chars[bbox].append(char)
+
+    def _bucket(self, x, y):
+        return int(x // self.grid_size), int(y // self.grid_size)
+
+    def _buckets(self, bbox):
+        x0, y0 = self._bucket(bbox[0], bbox[1])
+        x1, y1 = self._bucket(bbox[2], bbox[3])
+        return [(gx, gy) for gx in range(x0, x1 + 1) for gy in range(y0, y1 + 1)]
+
+    def chars(self, cell_bbox):
+        return self._chars.get(cell_bbox, [])
+
+    def text(self, cell_bbox):
+        """Teks sel (sama dengan within_bbox(cell_bbox).extract_text())"""
+        if cell_bbox not in self._texts:
+            from pdfplumber import utils
+
+            chars = self.chars(cell_bbox)
+            if not chars:
+                self._texts[cell_bbox] = ""
+            else:
+                x0, top, x1, bottom = cell_bbox
+                textmap = utils.chars_to_textmap(chars, layout_bbox=cell_bbox,
+                                                 layout_width=x1 - x0, layout_height=bottom - top)
+                self._texts[cell_bbox] = textmap.as_string
+        return self._texts[cell_bbox]
+
+
+def index_tables(page, tables):
+    """Satu CellTextIndex untuk semua sel dari semua tabel (hasil find_tables) di halaman"""
+    return CellTextIndex(page, [bbox for table in tables for row in table.rows for bbox in row.cells])
@@ -1,59 +1,340 @@
 import os
+import re
+import statistics
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import fitz  # PyMuPDF
-from paddleocr import PaddleOCR
-import logging
+import numpy as np
+from core.ocr_cache import get_ocr_cache, file_sha256, region_key
+from core.ocr_pool import get_ocr_pool
 
-# Matikan semua log sistem agar tidak bentrok dengan Streamlit
-logging.getLogger("ppocr").setLevel(logging.ERROR)
+def pixmap_to_array(pix):
+    """Array NumPy atas buffer sampel pixmap, urutan kanal BGR seperti cv2.imread.
 
-# --- FLAG STABILITAS MUTLAK (Wajib untuk Windows + Python 3.13) ---
-os.environ['FLAGS_use_mkldnn'] = '0'
-os.environ['FLAGS_enable_pir_api'] = '0'
-os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-os.environ['FLAGS_allocator_strategy'] = 'naive_best_fit' # Memperbaiki masalah memori
+    Render tidak lagi ditulis/dibaca sebagai PNG, tetapi ini bukan zero-copy penuh:
+    untuk pixmap RGB, pembalikan kanal adalah view dengan stride negatif, sehingga
+    OpenCV/PaddleOCR tetap membuat satu salinan kontigu saat memprosesnya.
+    Array hanya valid selama objek `pix` masih hidup.
+    """
+    arr = np.ndarray((pix.height, pix.width, pix.n), dtype=np.uint8,
+                     buffer=pix.samples_mv, strides=(pix.stride, pix.n, 1))
+    # PaddleOCR mengharapkan BGR; view stride negatif ini disalin sekali oleh konsumennya
+    return arr[..., ::-1] if pix.n == 3 else arr
+
+# Ambang text layer: di bawah ini halaman dianggap hasil scan / hanya gambar
+MIN_TEXT_CHARS = 25
+MAX_INVALID_GLYPH_RATIO = 0.1
+# Gambar di halaman ber-teks yang menutupi >= 10% halaman di-OCR terpisah (mis. tabel hasil scan)
+IMAGE_REGION_MIN_COVERAGE = 0.10
+
+def is_invalid_glyph(ch):
+    """Glyph tanpa mapping Unicode yang benar (font rusak/tanpa ToUnicode)"""
+    code = ord(ch)
+    return ch == "\ufffd" or 0xE000 <= code <= 0xF8FF or (code < 32 and ch not in "\n\r\t")
+
+def page_text_quality(page):
+    """Ukur kelayakan text layer satu halaman: jumlah karakter, glyph rusak, cakupan gambar"""
+    text = page.get_text("text")
+    chars = [ch for ch in text if not ch.isspace()]
+    invalid = sum(1 for ch in chars if is_invalid_glyph(ch))
+
+    page_area = abs(page.rect) or 1
+    image_regions = []
+    native_scales = []
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        if not bbox.is_empty:
+            image_regions.append(bbox)
+            if abs(bbox) / page_area >= IMAGE_REGION_MIN_COVERAGE and info["bbox"][2] > info["bbox"][0]:
+                # Resolusi asli gambar (pixel per pt): render di atas ini tidak menambah detail
+                native_scales.append(info["width"] / (info["bbox"][2] - info["bbox"][0]))
+    # Jumlah luas (dibatasi 1.0); tumpang tindih antar gambar jarang di manual
+    coverage = min(1.0, sum(abs(bbox) for bbox in image_regions) / page_area)
+    invalid_ratio = invalid / len(chars) if chars else 0.0
+
+    # Halaman tanpa teks tapi ada gambar/vektor (mis. scan yang content stream-nya rusak).
+    # get_drawings() mahal, jadi hanya dicek jika text layer memang tidak layak.
+    usable_text = len(chars) >= MIN_TEXT_CHARS and invalid_ratio <= MAX_INVALID_GLYPH_RATIO
+    has_graphics = bool(image_regions) or (not usable_text and bool(page.get_images() or page.get_drawings()))
+
+    return {
+        "text": text.strip(),
+        "chars": len(chars),
+        "invalid_ratio": invalid_ratio,
+        "image_coverage": coverage,
+        "image_regions": [bbox for bbox in image_regions if abs(bbox) / page_area >= IMAGE_REGION_MIN_COVERAGE],
+        "has_graphics": has_graphics,
+        "native_scale": max(native_scales) if native_scales else None,
+    }
+
+def choose_page_source(quality):
+    """'text' (text layer saja), 'text+ocr' (text layer + OCR area gambar), 'ocr' (seluruh halaman) atau 'empty'"""
+    if quality["chars"] < MIN_TEXT_CHARS or quality["invalid_ratio"] > MAX_INVALID_GLYPH_RATIO:
+        return "ocr" if quality["has_graphics"] or quality["chars"] else "empty"
+    return "text+ocr" if quality["image_regions"] else "text"
+
+# Skala render adaptif: target tinggi teks dalam pixel untuk OCR.
+# 25 px pada teks 10 pt = skala 2.5 (nilai tetap lama), jadi halaman biasa tidak berubah.
+TARGET_TEXT_PX = 25
+DEFAULT_TEXT_HEIGHT_PT = 10
+MIN_RENDER_SCALE = 1.0
+MAX_RENDER_SCALE = 4.0
+# Batas pixel per render (A4 @ 2.5x ~ 3.1 MP; A3 @ 2.5x ~ 6.3 MP)
+MAX_RENDER_PIXELS = 5_000_000
+
+def estimate_text_height(page):
+    """Median ukuran font (pt) di text layer halaman, atau None jika tidak ada teks"""
+    sizes = [span["size"] for block in page.get_text("dict")["blocks"] for line in block.get("lines", [])
+             for span in line["spans"] if span["text"].strip()]
+    return statistics.median(sizes) if sizes else None
+
+def choose_render_scale(page, quality=None, clip=None, text_height=None):
+    """Skala render per halaman/area dari ukuran teks, resolusi asli scan, dan luas area"""
+    text_height = text_height or estimate_text_height(page) or DEFAULT_TEXT_HEIGHT_PT
+    scale = TARGET_TEXT_PX / text_height
+    native_scale = quality.get("native_scale") if quality else None
+    if native_scale:
+        scale = min(scale, native_scale)
+
+    area = abs(clip if clip is not None else page.rect) or 1
+    scale = min(scale, (MAX_RENDER_PIXELS / area) ** 0.5)
+    return round(max(MIN_RENDER_SCALE, min(MAX_RENDER_SCALE, scale)), 2)
+
+def parse_ocr_result(result):
+    """Hasil mentah PaddleOCR -> list baris {"box", "text", "confidence"} (JSON-able)"""
+    lines = []
+    if result and result[0]:
+        for line in result[0]:
+            # Mengambil teks (indeks 1, elemen 0)
+            if line and len(line) > 1:
+                lines.append({
+                    "box": [[float(x), float(y)] for x, y in line[0]],
+                    "text": str(line[1][0]),
+                    "confidence": float(line[1][1]) if len(line[1]) > 1 else None,
+                })
+    return lines
+
+def lines_to_text(lines):
+    return " ".join(line["text"] for line in lines).strip()
+
+def preview_dir(preview_key):
+    """Folder preview per sesi/dokumen agar sesi berbeda tidak saling menimpa"""
+    safe_key = re.sub(r'[^\w.-]', '_', str(preview_key))
+    return os.path.join(os.getcwd(), "temp_assets", safe_key)
 
 class PDFExtractor:
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, lang='id', cache=None):
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"File tidak ditemukan: {pdf_path}")
         
+        self.pdf_path = pdf_path
         self.doc = fitz.open(pdf_path)
         
-        # Inisialisasi hanya dengan parameter paling dasar
-        # Jangan tambahkan use_gpu atau show_log di sini
-        try:
-            self.ocr = PaddleOCR(
-                use_angle_cls=True, 
-                lang='id',
-                enable_mkldnn=False
-            )
-        except Exception as e:
-            print(f"Gagal inisialisasi PaddleOCR: {e}")
+        # Engine PaddleOCR tidak dibuat per extractor: dipinjam dari pool bersama
+        # (per proses) saat OCR benar-benar dijalankan
+        self.ocr_pool = get_ocr_pool(lang)
 
-    def process_single_page(self, page_num, scale=2.5):
-        temp_dir = os.path.join(os.getcwd(), "temp_assets")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # 1. Render PDF ke Gambar
+        # Cache hasil OCR di disk (default: cache bersama, dibuka saat OCR pertama); cache=False untuk mematikan
+        self._cache = cache
+        self._doc_hash = None
+
+    @property
+    def cache(self):
+        """Cache OCR; cache bersama baru dibuka (file SQLite dibuat) saat pertama dibutuhkan"""
+        if self._cache is None:
+            self._cache = get_ocr_cache()
+        return self._cache or None
+
+    @property
+    def doc_hash(self):
+        """Hash isi PDF (kunci cache), dihitung sekali saat pertama dibutuhkan"""
+        if self._doc_hash is None:
+            self._doc_hash = file_sha256(self.pdf_path)
+        return self._doc_hash
+
+    def cached_lines(self, page_num, scale, clip=None):
+        if self.cache is None: return None
+        return self.cache.get(self.doc_hash, page_num, scale, self.ocr_pool.engine_id, region_key(clip))
+
+    def store_lines(self, page_num, scale, clip, lines):
+        if self.cache is None: return
+        self.cache.put(self.doc_hash, page_num, scale, self.ocr_pool.engine_id, region_key(clip), lines)
+
+    def process_single_page(self, page_num, scale=2.5, preview_key=None):
+        """OCR satu halaman langsung dari memori (atau dari cache).
+
+        PNG preview hanya ditulis jika `preview_key` diberikan (mis. id sesi UI),
+        ke temp_assets/<preview_key>/; jika tidak, path yang dikembalikan None.
+        """
+        lines = self.cached_lines(page_num, scale)
+
+        # 1. Render PDF ke array (tanpa simpan/baca ulang PNG); dilewati jika cache kena & preview tidak diminta
         page = self.doc[page_num]
-        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-        img_path = os.path.join(temp_dir, f"ocr_page_{page_num}.png")
-        pix.save(img_path)
+        pix = None
+        if lines is None or preview_key is not None:
+            pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+
+        img_path = None
+        if preview_key is not None:
+            temp_dir = preview_dir(preview_key)
+            os.makedirs(temp_dir, exist_ok=True)
+            img_path = os.path.join(temp_dir, f"ocr_page_{page_num}.png")
+            pix.save(img_path)
 
         # 2. Jalankan OCR dengan penanganan error ketat
-        page_text = ""
+        error = None
+        if lines is None:
+            lines, error = self.ocr_image_lines(pixmap_to_array(pix))
+            if not error:
+                self.store_lines(page_num, scale, None, lines)
+
+        page_text = lines_to_text(lines)
+        if error:
+            page_text = f"[Error OCR: {error}]"
+        elif not page_text:
+            page_text = "[Tidak ada teks terdeteksi]"
+        
+        return page_text, img_path
+
+    def ocr_image_lines(self, img):
+        """OCR satu array gambar (BGR). Return (list baris OCR, pesan_error)"""
         try:
             # Panggil fungsi ocr tanpa parameter tambahan apa pun
-            result = self.ocr.ocr(img_path)
-            
-            if result and result[0]:
-                for line in result[0]:
-                    # Mengambil teks (indeks 1, elemen 0)
-                    if line and len(line) > 1:
-                        page_text += str(line[1][0]) + " "
-            else:
-                page_text = "[Tidak ada teks terdeteksi]"
+            with self.ocr_pool.engine() as ocr:
+                result = ocr.ocr(img)
         except Exception as e:
-            page_text = f"[Error OCR: {str(e)}]"
-        
-        return page_text.strip(), img_path
\ No newline at end of file
+            return [], str(e)
+        return parse_ocr_result(result), None
+
+    def ocr_image(self, img):
+        """OCR satu array gambar (BGR). Return (teks, pesan_error)"""
+        lines, error = self.ocr_image_lines(img)
+        return lines_to_text(lines), error
+
+    def plan_page(self, page_num, ocr_images=True):
+        """Tentukan sumber teks satu halaman (tanpa OCR). Return (item, quality)"""
+        page = self.doc[page_num]
+        quality = page_text_quality(page)
+        source = choose_page_source(quality)
+        if source == "text+ocr" and not ocr_images:
+            source = "text"
+
+        item = {
+            "page": page_num,
+            "source": source,
+            "chars": quality["chars"],
+            "invalid_ratio": round(quality["invalid_ratio"], 3),
+            "image_coverage": round(quality["image_coverage"], 3),
+            "text": quality["text"] if source.startswith("text") else "",
+        }
+        return item, quality
+
+    def ocr_targets(self, page_num, quality=None, scale=None, clips=(None,)):
+        """Target OCR halaman (atau area `clips`): skala adaptif jika scale=None,
+        hasil dari cache jika ada, dan pixmap hanya untuk target yang belum ter-cache"""
+        page = self.doc[page_num]
+        text_height = None if scale else (estimate_text_height(page) or DEFAULT_TEXT_HEIGHT_PT)
+        targets = []
+        for clip in clips:
+            clip_scale = scale or choose_render_scale(page, quality, clip, text_height)
+            target = {"clip": clip, "scale": clip_scale, "lines": self.cached_lines(page_num, clip_scale, clip)}
+            if target["lines"] is None:
+                target["pix"] = page.get_pixmap(matrix=fitz.Matrix(clip_scale, clip_scale), clip=clip, alpha=False)
+            targets.append(target)
+        return targets
+
+    def _ocr_arrays(self, arrays):
+        return [self.ocr_image_lines(img) for img in arrays]
+
+    def _finish_job(self, item, targets, finish):
+        finish(item, [text for text in (lines_to_text(target["lines"]) for target in targets) if text])
+        item["ocr_scale"] = max(target["scale"] for target in targets)
+        item["ocr_cached"] = all("pix" not in target for target in targets)
+        errors = [target["error"] for target in targets if target.get("error")]
+        if errors:
+            item["error"] = errors[0]
+        return item
+
+    def _run_ocr_jobs(self, jobs, workers):
+        """Render di thread pemanggil (dokumen fitz tidak thread-safe), OCR di thread pool.
+
+        `jobs` menghasilkan (item, targets, finish). Render halaman berikutnya
+        berjalan bersamaan dengan OCR halaman sebelumnya; jumlah halaman yang
+        sudah dirender tapi belum selesai di-OCR dibatasi agar memori terkendali.
+        Target yang sudah ada di cache tidak dirender maupun di-OCR.
+        Hasil di-yield begitu satu halaman selesai (urutan bisa berbeda).
+        """
+        workers = max(1, workers or self.ocr_pool.max_size)
+        pending = {}
+
+        def collect(timeout):
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, targets, finish = pending.pop(future)
+                missing = [target for target in targets if target["lines"] is None]
+                for target, (lines, error) in zip(missing, future.result()):
+                    target["lines"] = lines
+                    if error:
+                        target["error"] = error
+                    else:
+                        self.store_lines(item["page"], target["scale"], target["clip"], lines)
+                # Pixmap dilepas di thread pemanggil, setelah OCR selesai
+                for target in missing:
+                    target["pix"] = None
+                yield self._finish_job(item, targets, finish)
+
+        with ThreadPoolExecutor(workers, thread_name_prefix="ocr") as executor:
+            for item, targets, finish in jobs:
+                missing = [target for target in targets if target["lines"] is None]
+                if not missing:
+                    yield self._finish_job(item, targets, finish) if targets else item
+                    continue
+                arrays = [pixmap_to_array(target["pix"]) for target in missing]
+                pending[executor.submit(self._ocr_arrays, arrays)] = (item, targets, finish)
+                yield from collect(0)
+                while len(pending) > workers:
+                    yield from collect(None)
+            while pending:
+                yield from collect(None)
+
+    def process_pages(self, page_nums=None, scale=None, workers=None):
+        """OCR banyak halaman paralel; yield {'page', 'text', 'ocr_scale', ...} begitu tiap halaman selesai"""
+        page_nums = range(len(self.doc)) if page_nums is None else page_nums
+
+        def set_text(item, texts):
+            item["text"] = " ".join(texts)
+
+        def jobs():
+            for page_num in page_nums:
+                yield {"page": page_num, "source": "ocr"}, self.ocr_targets(page_num, scale=scale), set_text
+        return self._run_ocr_jobs(jobs(), workers)
+
+    def _document_jobs(self, page_nums, scale, ocr_images):
+        def set_page_text(item, texts):
+            item["text"] = "\n".join([item["text"]] + texts) if item["source"] == "text+ocr" else " ".join(texts)
+
+        for page_num in page_nums:
+            item, quality = self.plan_page(page_num, ocr_images)
+            if item["source"] == "ocr":
+                targets = self.ocr_targets(page_num, quality, scale)
+            elif item["source"] == "text+ocr":
+                # Hanya area gambar besar yang di-render & di-OCR, teksnya ditambahkan setelah text layer
+                item["ocr_regions"] = len(quality["image_regions"])
+                targets = self.ocr_targets(page_num, quality, scale, clips=quality["image_regions"])
+            else:
+                targets = []
+            yield item, targets, set_page_text
+
+    def iter_document(self, scale=None, ocr_images=True, workers=None):
+        """Ekstraksi hybrid seluruh dokumen; halaman text layer langsung di-yield,
+        halaman/area yang butuh OCR di-yield begitu OCR-nya selesai"""
+        return self._run_ocr_jobs(self._document_jobs(range(len(self.doc)), scale, ocr_images), workers)
+
+    def extract_page(self, page_num, scale=None, ocr_images=True):
+        """Ekstraksi hybrid satu halaman: text layer dulu, OCR hanya jika perlu"""
+        return next(self._run_ocr_jobs(self._document_jobs([page_num], scale, ocr_images), workers=1))
+
+    def extract_document(self, scale=None, ocr_images=True, workers=None):
+        """Ekstraksi seluruh dokumen (urut halaman); setiap halaman ditandai sumbernya
+        ('text', 'text+ocr', 'ocr', 'empty')"""
+        pages = list(self.iter_document(scale=scale, ocr_images=ocr_images, workers=workers))
+        return sorted(pages, key=lambda item: item["page"])
@@ -1,5 +1,93 @@
 from fpdf import FPDF
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_INPUT_DIR = "data_output"
+DEFAULT_OUTPUT_DIR = os.path.join("output_results", "standardized_pdf")
+REPORT_NAME = "generation_report.json"
+# File JSON hasil main_normalization.py yang bukan dokumen (manifest, metrics, ringkasan)
+NON_DOCUMENT_JSON = {"master_audit_summary.json", "normalization_manifest.json", "run_metrics.json",
+                     "run_trace.json", REPORT_NAME}
+# Key dokumen main_normalization.py ({metadata, content, detected_headings}) yang bukan bab
+NON_CHAPTER_KEYS = {"metadata", "content", "detected_headings"}
+
+# Gambar dicetak selebar 120 mm; piksel di atas resolusi cetak hanya menambah ukuran PDF
+IMAGE_SLOT_MM = 120
+PRINT_DPI = 300
+# Worker diganti setelah sekian dokumen agar memori (buffer fpdf + gambar) tidak menumpuk
+MAX_DOCS_PER_WORKER = 20
+
+# Font inti fpdf hanya latin-1: tanda baca umum dipetakan, karakter lain jadi '?'
+PDF_TEXT_MAP = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-",
+                              "—": "-", "•": "\xb7", "…": "...", "≤": "<=", "≥": ">=",
+                              " ": " ", "™": "(TM)"})
+
+def pdf_text(text):
+    return str(text).translate(PDF_TEXT_MAP).encode('latin-1', 'replace').decode('latin-1')
+
+def slot_pixels(width_mm=IMAGE_SLOT_MM, dpi=PRINT_DPI):
+    """Lebar piksel maksimum untuk slot gambar selebar width_mm pada dpi cetak"""
+    return round(width_mm / 25.4 * dpi)
+
+
+class ImageStore:
+    """Gambar untuk satu dokumen: setiap gambar berbeda (berdasarkan isi file) disiapkan
+    sekali, diperkecil ke resolusi cetak slot-nya, lalu path yang sama dipakai ulang
+    sehingga fpdf hanya menyimpan satu salinan di PDF."""
+
+    def __init__(self, work_dir, max_width=None):
+        self.work_dir = work_dir
+        self.max_width = max_width or slot_pixels()
+        self._prepared = {}
+        self.stats = {"requested": 0, "unique": 0, "downscaled": 0, "missing": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def prepare(self, path):
+        """Path gambar siap-embed, atau None jika file tidak ada / tidak bisa dibaca"""
+        from PIL import Image
+
+        self.stats["requested"] += 1
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.stats["missing"] += 1
+            return None
+        digest = hashlib.sha1(data).hexdigest()
+        if digest in self._prepared:
+            return self._prepared[digest]
+
+        try:
+            with Image.open(path) as img:
+                img.load()
+                # fpdf 1.7 tidak mendukung alpha/palet: ratakan ke RGB (atau L untuk grayscale)
+                mode = "L" if img.mode in ("1", "L", "LA") else "RGB"
+                if img.mode in ("RGBA", "LA", "P"):
+                    background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+                    background.alpha_composite(img.convert("RGBA"))
+                    img = background
+                img = img.convert(mode)
+                if img.width > self.max_width:
+                    height = max(1, round(img.height * self.max_width / img.width))
+                    img = img.resize((self.max_width, height), Image.LANCZOS)
+                    self.stats["downscaled"] += 1
+                out_path = os.path.join(self.work_dir, f"{digest}.png")
+                img.save(out_path, optimize=True)
+        except OSError:
+            self.stats["missing"] += 1
+            return None
+
+        self.stats["unique"] += 1
+        self.stats["bytes_in"] += len(data)
+        self.stats["bytes_out"] += os.path.getsize(out_path)
+        self._prepared[digest] = out_path
+        return out_path
+
 
 class PDFGenerator:
     def __init__(self, output_filename):
@@ -7,32 +95,141 @@ class PDFGenerator:
         self.pdf = FPDF()
         self.pdf.set_auto_page_break(auto=True, margin=15)
 
-    def create_standard_pdf(self, original_name, final_data, manual_crops, session_state):
-        self.pdf.add_page()
-        # Judul Dokumen
-        self.pdf.set_font("Arial", 'B', 16)
-        self.pdf.cell(0, 10, txt=f"STANDARISASI: {original_name.upper()}", ln=True, align='C')
-        self.pdf.ln(10)
-
-        for bab, content in final_data.items():
-            # Nama Bab
-            self.pdf.set_font("Arial", 'B', 14)
-            self.pdf.set_fill_color(240, 240, 240)
-            self.pdf.cell(0, 10, txt=bab, ln=True, fill=True)
-            self.pdf.ln(5)
-
-            # Isi Teks
-            self.pdf.set_font("Arial", '', 11)
-            self.pdf.multi_cell(0, 7, txt=content)
-            self.pdf.ln(5)
-
-            # Cek Gambar yang dicentang untuk Bab ini
-            for idx, img_path in enumerate(manual_crops):
-                # ID Checkbox: chk_{bab}_{idx}
-                if session_state.get(f"chk_{bab}_{idx}"):
-                    if os.path.exists(img_path):
+    def create_standard_pdf(self, original_name, final_data, manual_crops=(), session_state=None):
+        """Versi Streamlit: gambar dipilih lewat checkbox chk_{bab}_{idx} di session_state"""
+        images = {}
+        if session_state is not None:
+            for bab in final_data:
+                images[bab] = [img_path for idx, img_path in enumerate(manual_crops)
+                               if session_state.get(f"chk_{bab}_{idx}")]
+        return self.render(original_name, final_data, images)
+
+    def render(self, original_name, final_data, images=None):
+        """Tulis PDF standar. final_data: {bab: isi} atau {bab: {sub_bab: isi}};
+        images: {bab: [path gambar]}. Return statistik gambar."""
+        images = images or {}
+        with tempfile.TemporaryDirectory(prefix="pdfgen_") as work_dir:
+            store = ImageStore(work_dir)
+            self.pdf.add_page()
+            # Judul Dokumen
+            self.pdf.set_font("Arial", 'B', 16)
+            self.pdf.cell(0, 10, txt=pdf_text(f"STANDARISASI: {original_name.upper()}"), ln=True, align='C')
+            self.pdf.ln(10)
+
+            for bab, content in final_data.items():
+                # Nama Bab
+                self.pdf.set_font("Arial", 'B', 14)
+                self.pdf.set_fill_color(240, 240, 240)
+                self.pdf.cell(0, 10, txt=pdf_text(bab), ln=True, fill=True)
+                self.pdf.ln(5)
+
+                # Isi Teks (dict = sub-bab dari AIHandler)
+                sections = content.items() if isinstance(content, dict) else [(None, content)]
+                for sub_name, text in sections:
+                    if sub_name:
+                        self.pdf.set_font("Arial", 'B', 12)
+                        self.pdf.cell(0, 8, txt=pdf_text(sub_name), ln=True)
+                    self.pdf.set_font("Arial", '', 11)
+                    self.pdf.multi_cell(0, 7, txt=pdf_text(text or ""))
+                    self.pdf.ln(5)
+
+                # Gambar untuk Bab ini
+                for img_path in images.get(bab, ()):
+                    prepared = store.prepare(img_path)
+                    if prepared:
                         # Ukuran gambar otomatis 120mm lebar
-                        self.pdf.image(img_path, w=120)
+                        self.pdf.image(prepared, w=IMAGE_SLOT_MM)
                         self.pdf.ln(5)
-        
-        self.pdf.output(self.output_filename)
\ No newline at end of file
+
+            self.pdf.output(self.output_filename)
+        return {"pages": self.pdf.page_no(), **store.stats}
+
+
+# ==========================================
+# GENERASI MASSAL (SELURUH KORPUS)
+# ==========================================
+def document_chapters(data, default_title):
+    """(judul, {bab: isi}) dari JSON hasil normalisasi. Bentuk flat {bab: isi} (AIHandler)
+    dipakai apa adanya; bentuk main_normalization.py {metadata, content, detected_headings}
+    memakai isi `content` dan judul dari metadata.file_name."""
+    if isinstance(data.get("content"), dict):
+        file_name = (data.get("metadata") or {}).get("file_name")
+        title = Path(file_name).stem if file_name else default_title
+        chapters = data["content"]
+    else:
+        title, chapters = default_title, data
+    return title, {bab: content for bab, content in chapters.items() if bab not in NON_CHAPTER_KEYS}
+
+def find_documents(input_dir=DEFAULT_INPUT_DIR):
+    return sorted(path for path in Path(input_dir).rglob("*.json") if path.name not in NON_DOCUMENT_JSON)
+
+def _generate_one(job):
+    json_path, pdf_path, images = job
+    start = time.perf_counter()
+    result = {"source": json_path, "output": pdf_path}
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("JSON bukan dokumen {bab: isi}")
+        title, chapters = document_chapters(data, Path(json_path).stem)
+        os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+        result.update(PDFGenerator(pdf_path).render(title, chapters, images))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+def generate_corpus(input_dir=DEFAULT_INPUT_DIR, output_dir=DEFAULT_OUTPUT_DIR, workers=None, image_map=None):
+    """Buat PDF standar untuk semua JSON di input_dir (struktur folder dipertahankan).
+
+    image_map: {path JSON relatif terhadap input_dir: {bab: [path gambar]}}.
+    Dokumen dibagi ke process pool (spawn); hasil per dokumen ditulis ke
+    generation_report.json di output_dir.
+    """
+    input_path, output_path = Path(input_dir), Path(output_dir)
+    image_map = image_map or {}
+    jobs = []
+    for json_path in find_documents(input_path):
+        relative = json_path.relative_to(input_path).as_posix()
+        pdf_path = (output_path / relative).with_suffix(".pdf")
+        jobs.append((str(json_path), str(pdf_path), image_map.get(relative, {})))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    start = time.perf_counter()
+    print(f"[INFO] {len(jobs)} dokumen, {workers} worker")
+    results = []
+    if workers <= 1:
+        results = [_generate_one(job) for job in jobs]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, maxtasksperchild=MAX_DOCS_PER_WORKER) as pool:
+            # imap_unordered + chunksize=1: dokumen besar tidak menahan antrian worker lain
+            results = list(pool.imap_unordered(_generate_one, jobs, chunksize=1))
+
+    results.sort(key=lambda item: item["source"])
+    failed = [item for item in results if "error" in item]
+    for item in failed:
+        print(f"[WARN] Gagal: {item['source']} ({item['error']})")
+    output_path.mkdir(parents=True, exist_ok=True)
+    with open(output_path / REPORT_NAME, 'w', encoding='utf-8') as f:
+        json.dump({"wall_seconds": round(time.perf_counter() - start, 4), "workers": workers,
+                   "documents": results}, f, indent=4, ensure_ascii=False)
+    print(f"[DONE] {len(results) - len(failed)}/{len(results)} PDF dibuat di {output_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate PDF standar untuk seluruh hasil normalisasi")
+    parser.add_argument("--input", default=DEFAULT_INPUT_DIR, help="Folder JSON hasil normalisasi")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="Folder PDF hasil")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses (default: jumlah CPU)")
+    parser.add_argument("--images", default=None,
+                        help="JSON {path JSON relatif: {bab: [path gambar]}} untuk gambar per bab")
+    args = parser.parse_args()
+
+    image_map = None
+    if args.images:
+        with open(args.images, 'r', encoding='utf-8') as f:
+            image_map = json.load(f)
+    generate_corpus(args.input, args.output, args.workers, image_map)
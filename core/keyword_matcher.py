@@ -0,0 +1,94 @@
+# Lokasi: core/keyword_matcher.py
+from collections import deque
+
+
+class KeywordMatcher:
+    """Pencocok multi-keyword (Aho-Corasick) yang dikompilasi sekali dari schema.
+
+    Schema boleh berbentuk {label: {"keywords": [...], "exclude": [...]}} atau
+    {label: [keywords]}. Satu kali scan per baris (lowercase) menghasilkan
+    bitmask label yang keyword-nya muncul dan bitmask label yang exclude-nya
+    muncul. Bit ke-i sesuai urutan label di schema, sehingga prioritas
+    "label pertama menang" tetap sama seperti loop lama.
+    """
+
+    def __init__(self, schema):
+        self.labels = list(schema.keys())
+
+        # Trie: goto[node] = {char: node}, lalu output bitmask per node
+        self.goto = [{}]
+        self.keyword_out = [0]
+        self.exclude_out = [0]
+
+        for label_idx, value in enumerate(schema.values()):
+            if isinstance(value, dict):
+                keywords, excludes = value.get("keywords", []), value.get("exclude", [])
+            else:
+                keywords, excludes = value, []
+            for kw in keywords:
+                node = self._add_pattern(kw.lower())
+                self.keyword_out[node] |= 1 << label_idx
+            for ex in excludes:
+                node = self._add_pattern(ex.lower())
+                self.exclude_out[node] |= 1 << label_idx
+
+        self._build_fail_links()
+
+    def _add_pattern(self, pattern):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.keyword_out.append(0)
+                self.exclude_out.append(0)
+            node = nxt
+        return node
+
+    def _build_fail_links(self):
+        # BFS: output tiap node digabung dengan output node fail-nya.
+        # Anak langsung root selalu fail ke root (0).
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(ch, 0)
+                self.keyword_out[child] |= self.keyword_out[self.fail[child]]
+                self.exclude_out[child] |= self.exclude_out[self.fail[child]]
+
+    def scan(self, text):
+        """Satu kali lewat teks: kembalikan (keyword_mask, exclude_mask)"""
+        goto, fail = self.goto, self.fail
+        keyword_out, exclude_out = self.keyword_out, self.exclude_out
+        # Pattern kosong ada di root dan selalu cocok
+        keyword_mask, exclude_mask = keyword_out[0], exclude_out[0]
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            keyword_mask |= keyword_out[node]
+            exclude_mask |= exclude_out[node]
+        return keyword_mask, exclude_mask
+
+    def first_label(self, mask):
+        """Label dengan prioritas tertinggi (urutan schema) dari sebuah bitmask"""
+        if not mask: return None
+        return self.labels[(mask & -mask).bit_length() - 1]
+
+    def mask_to_flags(self, mask):
+        return [bool(mask >> idx & 1) for idx in range(len(self.labels))]
+
+    def match(self, text):
+        """Label pertama yang keyword-nya muncul di teks, atau None"""
+        return self.first_label(self.scan(text)[0])
+
+    def has_keyword(self, text):
+        return bool(self.scan(text)[0])
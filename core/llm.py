@@ -0,0 +1,321 @@
+# Lokasi: core/llm.py
+import hashlib
+import json
+import os
+import re
+import time
+
+from core.llm_scheduler import INTERACTIVE, get_scheduler
+from core.retrieval import estimate_tokens
+from core.sqlite_cache import SQLiteCache, cache_parser, run_cli, shared_cache
+
+DEFAULT_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join("temp_assets", "llm_cache.sqlite"))
+# Batas ukuran isi cache (byte jawaban); entri paling lama tidak dipakai dibuang dulu
+DEFAULT_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+# Umur maksimum jawaban di cache (jam); 0 = tidak kedaluwarsa
+DEFAULT_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_HOURS", "168")) * 3600
+# LLM_CACHE_DISABLE=1 mematikan cache untuk semua pemanggilan (sama dengan bypass=True)
+CACHE_DISABLED = os.environ.get("LLM_CACHE_DISABLE", "0") == "1"
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+GEMINI_MODEL = 'gemini-1.5-flash'
+
+
+def cache_key(backend, model, prompt, params=None):
+    """Kunci isi: hash dari backend, model, prompt, dan parameter generasi"""
+    blob = json.dumps({"backend": backend, "model": model, "prompt": prompt, "params": params or {}},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class LLMCache(SQLiteCache):
+    """Cache jawaban LLM di SQLite, kunci = cache_key(...).
+
+    Entri lebih tua dari `ttl` dianggap tidak ada (dan dihapus); total ukuran
+    dibatasi `max_bytes` dengan membuang entri paling lama tidak dipakai.
+    Aman dipanggil dari thread mana pun.
+    """
+
+    TABLE = "llm_responses"
+    COLUMNS = """
+        key TEXT PRIMARY KEY,
+        backend TEXT NOT NULL,
+        model TEXT NOT NULL,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        last_access REAL NOT NULL"""
+    KEY_COLUMNS = ("key",)
+    INDEX = "idx_llm_last_access"
+    STATS = ("hits", "misses", "writes", "evicted", "expired", "bypassed")
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_SECONDS):
+        super().__init__(path, max_bytes)
+        self.ttl = ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM llm_responses WHERE key=?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_responses WHERE key=?", (key,))
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._touch((key,), now)
+        return row[0]
+
+    def put(self, key, backend, model, response):
+        now = time.time()
+        self._insert((key, backend, model, response, len(response.encode('utf-8')), now, now))
+
+    def note_bypass(self):
+        self.count("bypassed")
+
+    def prune(self):
+        """Hapus semua entri kedaluwarsa. Return jumlah entri."""
+        if not self.ttl: return 0
+        return self._delete("created < ?", (time.time() - self.ttl,))
+
+    def invalidate(self, backend=None):
+        """Hapus cache satu backend, atau seluruh cache jika backend=None. Return jumlah entri."""
+        if backend is None:
+            return self._delete()
+        return self._delete("backend=?", (backend,))
+
+    def summary(self):
+        return {**super().summary(), "ttl_seconds": self.ttl}
+
+
+# Cache bersama (per proses) di DEFAULT_CACHE_PATH
+get_llm_cache = shared_cache(LLMCache)
+
+
+# ==========================================
+# PEMANGGILAN LLM (SEMUA LEWAT CACHE)
+# ==========================================
+def cached_call(backend, model, prompt, call, params=None, bypass=False, cache=None, priority=INTERACTIVE):
+    """Jawaban dari cache jika ada; selain itu `call()` dijalankan lewat scheduler
+    (antrean, rate limit, retry per backend) dan hasilnya disimpan.
+
+    bypass=True: selalu memanggil model (hasil baru tetap ditulis ke cache).
+    Error dari `call()` tidak disimpan dan dilempar ke pemanggil.
+    """
+    cache = cache or get_llm_cache()
+    key = cache_key(backend, model, prompt, params)
+    if bypass or CACHE_DISABLED:
+        cache.note_bypass()
+    else:
+        response = cache.get(key)
+        if response is not None:
+            return response
+    response = get_scheduler().call(backend, call, priority, estimate_tokens(prompt))
+    cache.put(key, backend, model, response)
+    return response
+
+def ollama_generate(prompt, model, url=OLLAMA_URL, session=None, timeout=(5, 120), bypass=False,
+                    priority=INTERACTIVE, **params):
+    """POST /api/generate (non-stream); `params` ikut payload (mis. format="json", options={...})"""
+    def call():
+        import requests
+        payload = {"model": model, "prompt": prompt, "stream": False, **params}
+        response = (session or requests).post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json().get('response', '').strip()
+    return cached_call("ollama", model, prompt, call, params, bypass, priority=priority)
+
+def gemini_generate(prompt, model=GEMINI_MODEL, bypass=False, priority=INTERACTIVE, **generation_config):
+    """generate_content Gemini; genai.configure(api_key=...) tetap urusan pemanggil"""
+    def call():
+        import google.generativeai as genai
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        return genai.GenerativeModel(model).generate_content(prompt, **kwargs).text
+    return cached_call("gemini", model, prompt, call, generation_config, bypass, priority=priority)
+
+
+# ==========================================
+# STREAMING (TEKS DATANG PER POTONGAN)
+# ==========================================
+def cached_stream(backend, model, prompt, stream_call, params=None, bypass=False, cache=None, finalize=None,
+                  priority=INTERACTIVE):
+    """Versi streaming cached_call: yield potongan teks dari `stream_call()`.
+
+    Kunci cache sama dengan versi non-stream, jadi jawaban yang sudah ada
+    langsung di-yield utuh. Jawaban baru disimpan hanya jika stream selesai
+    (consumer yang berhenti di tengah tidak mengisi cache).
+    """
+    cache = cache or get_llm_cache()
+    key = cache_key(backend, model, prompt, params)
+    if bypass or CACHE_DISABLED:
+        cache.note_bypass()
+    else:
+        response = cache.get(key)
+        if response is not None:
+            yield response
+            return
+    parts = []
+    for piece in get_scheduler().stream(backend, stream_call, priority, estimate_tokens(prompt)):
+        parts.append(piece)
+        yield piece
+    response = "".join(parts)
+    cache.put(key, backend, model, finalize(response) if finalize else response)
+
+def ollama_stream(prompt, model, url=OLLAMA_URL, session=None, timeout=(5, 120), bypass=False,
+                  priority=INTERACTIVE, **params):
+    """POST /api/generate dengan stream=True; yield potongan `response` dari setiap baris NDJSON"""
+    def stream_call():
+        import requests
+        payload = {"model": model, "prompt": prompt, "stream": True, **params}
+        with (session or requests).post(url, json=payload, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line: continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+    return cached_stream("ollama", model, prompt, stream_call, params, bypass, finalize=str.strip, priority=priority)
+
+def gemini_stream(prompt, model=GEMINI_MODEL, bypass=False, priority=INTERACTIVE, **generation_config):
+    """generate_content(stream=True) Gemini; yield teks setiap chunk"""
+    def stream_call():
+        import google.generativeai as genai
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        for chunk in genai.GenerativeModel(model).generate_content(prompt, stream=True, **kwargs):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # Chunk tanpa teks (mis. hanya metadata safety)
+            if text:
+                yield text
+    return cached_stream("gemini", model, prompt, stream_call, generation_config, bypass, priority=priority)
+
+
+# ==========================================
+# PARSER JSON PARSIAL
+# ==========================================
+PARTIAL_LITERAL_PATTERN = re.compile(r'[-+.\w]+$')
+PARTIAL_UNICODE_ESCAPE_PATTERN = re.compile(r'\\u[0-9a-fA-F]{0,3}$')
+
+def strip_code_fences(text):
+    return text.replace("```json", "").replace("```", "").strip()
+
+def parse_partial_json(text):
+    """Parse JSON yang belum selesai (mis. jawaban LLM di tengah stream).
+
+    Teks dipotong ke bagian terakhir yang utuh lalu kurung yang masih terbuka
+    ditutup: string nilai yang terpotong tetap ikut (isi parsial), key tanpa
+    nilai dan literal/angka yang terpotong dibuang. Return None jika belum ada
+    yang bisa di-parse.
+    """
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts: return None
+    text = text[min(starts):]
+
+    stack = []
+    in_string = escaped = string_is_key = after_key = False
+    string_start = key_start = 0
+    prev = None  # Karakter struktural terakhir di luar string
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                after_key = string_is_key
+                prev = '"'
+            continue
+        if ch == '"':
+            in_string = True
+            string_start = i
+            string_is_key = bool(stack) and stack[-1] == '{' and prev in ('{', ',')
+            if string_is_key:
+                key_start = i
+        elif ch in '{[':
+            stack.append(ch)
+        elif ch in '}]' and stack:
+            stack.pop()
+            if not stack:
+                # Nilai teratas sudah lengkap: teks setelahnya (mis. penutup ```) diabaikan
+                text = text[:i + 1]
+                break
+        if not ch.isspace() and ch != '"':
+            prev = ch
+            after_key = False
+
+    if in_string and string_is_key:
+        out = text[:key_start]
+    elif in_string:
+        body = text[string_start:-1] if escaped else text[string_start:]
+        out = PARTIAL_UNICODE_ESCAPE_PATTERN.sub('', body)
+        out = text[:string_start] + out + '"'
+    else:
+        out = text.rstrip()
+        literal = PARTIAL_LITERAL_PATTERN.search(out)
+        if literal:
+            try:
+                json.loads(literal.group())
+            except ValueError:
+                out = out[:literal.start()]
+        if after_key and out.endswith('"'):
+            out = out[:key_start]
+
+    out = out.rstrip()
+    if out.endswith(':'):
+        out = out[:key_start].rstrip()
+    if out.endswith(','):
+        out = out[:-1]
+    out += "".join('}' if opener == '{' else ']' for opener in reversed(stack))
+    try:
+        return json.loads(out)
+    except ValueError:
+        return None
+
+
+class IncrementalJSON:
+    """Kumpulkan potongan stream dan sediakan hasil parse terbaik sejauh ini.
+
+    parser = IncrementalJSON()
+    for chunk in stream: partial = parser.feed(chunk)
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.value = None
+
+    @property
+    def text(self):
+        return strip_code_fences(self.raw)
+
+    def feed(self, chunk):
+        self.raw += chunk
+        parsed = parse_partial_json(self.text)
+        if parsed is not None:
+            self.value = parsed
+        return self.value
+
+
+def _prune(cache, args):
+    print(f"[INFO] {cache.prune()} entri kedaluwarsa dihapus")
+
+def _invalidate(cache, args):
+    print(f"[INFO] {cache.invalidate(args.backend)} entri dihapus")
+
+
+if __name__ == "__main__":
+    parser, sub = cache_parser("Kelola cache jawaban LLM", DEFAULT_CACHE_PATH)
+    sub.add_parser("prune", help="Hapus entri yang sudah kedaluwarsa")
+    invalidate = sub.add_parser("invalidate", help="Hapus cache satu backend atau semuanya")
+    target = invalidate.add_mutually_exclusive_group(required=True)
+    target.add_argument("--backend", choices=["ollama", "gemini"])
+    target.add_argument("--all", action="store_true", help="Hapus seluruh cache")
+    run_cli(parser, LLMCache, {"prune": _prune, "invalidate": _invalidate})
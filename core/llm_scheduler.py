@@ -0,0 +1,336 @@
+# Lokasi: core/llm_scheduler.py
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from core.metrics import Metrics, get_logger
+from core.retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+log = get_logger("llm")
+
+# Lane prioritas: angka kecil dilayani dulu (Streamlit yang ditunggu operator sebelum batch)
+INTERACTIVE = 0
+BATCH = 10
+
+# Batas per backend. concurrency = request bersamaan (samakan dengan OLLAMA_NUM_PARALLEL untuk
+# Ollama); rpm/tpm = request/token per menit (0 = tanpa batas); retries = percobaan ulang.
+DEFAULT_LIMITS = {
+    "ollama": {"concurrency": int(os.environ.get("OLLAMA_CONCURRENCY", "4")), "rpm": 0, "tpm": 0, "retries": 2},
+    "gemini": {"concurrency": int(os.environ.get("GEMINI_CONCURRENCY", "4")),
+               # Free tier gemini-1.5-flash: 15 RPM, 1 juta TPM
+               "rpm": float(os.environ.get("GEMINI_RPM", "15")),
+               "tpm": float(os.environ.get("GEMINI_TPM", "1000000")), "retries": 4},
+    "mock": {"concurrency": 2, "rpm": 0, "tpm": 0, "retries": 3},
+}
+# Backend yang belum dikonfigurasi: satu request sekaligus, tanpa rate limit
+FALLBACK_LIMITS = {"concurrency": 1, "rpm": 0, "tpm": 0, "retries": 2}
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout", "ChunkedEncodingError",
+                   "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests"}
+
+
+class RetryableError(Exception):
+    """Error sementara (mis. dari backend mock) yang boleh dicoba ulang"""
+
+def is_retryable(error):
+    """429/5xx, timeout, koneksi putus, atau pesan kuota dari API dianggap sementara"""
+    if isinstance(error, (RetryableError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    if type(error).__name__ in RETRYABLE_NAMES:
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+def retry_after_seconds(error):
+    """Header Retry-After dari respons HTTP (jika ada)"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Bucket isi ulang kontinu `per_minute`/60 per detik, kapasitas `burst`.
+
+    Permintaan lebih besar dari kapasitas tetap lolos begitu bucket penuh (saldo
+    boleh minus), jadi rata-rata laju tetap terjaga tanpa request yang macet.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Tunggu sampai cukup token lalu ambil; return detik menunggu"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                need = min(amount, self.capacity)
+                if self.tokens >= need:
+                    self.tokens -= amount
+                    return waited
+                wait = (need - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def charge(self, amount):
+        """Potong token setelah request selesai (mis. token output yang baru diketahui)"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class PrioritySlots:
+    """Semaphore berprioritas: permit diberikan ke penunggu dengan prioritas terkecil (FIFO dalam lane)"""
+
+    def __init__(self, permits):
+        self.permits = permits
+        self.in_use = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def acquire(self, priority):
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            while self.in_use >= self.permits or self._waiters[0] != entry:
+                self._cond.wait()
+            heapq.heappop(self._waiters)
+            self.in_use += 1
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify_all()
+
+
+class _Backend:
+    def __init__(self, name, limits):
+        self.name = name
+        self.limits = dict(limits)
+        self.slots = PrioritySlots(max(1, self.limits["concurrency"]))
+        self.requests = TokenBucket(self.limits["rpm"], burst=1) if self.limits["rpm"] else None
+        self.tokens = TokenBucket(self.limits["tpm"]) if self.limits["tpm"] else None
+        # Antrean rate limit: satu penunggu (prioritas terkecil) menunggu bucket, tanpa memegang permit
+        self.rate_gate = PrioritySlots(1) if self.requests or self.tokens else None
+        self.max_queued = 0
+
+
+class LLMScheduler:
+    """Penjadwal semua pemanggilan LLM dalam satu proses.
+
+    Per backend: batas request bersamaan (permit berprioritas), bucket request/menit
+    dan token/menit, serta retry dengan exponential backoff + jitter untuk error
+    sementara. Pemanggilan berjalan di thread pemanggil, jadi streaming juga bisa
+    lewat sini (permit dipegang sampai stream selesai). Metrics: antrean, waktu
+    tunggu, durasi, retry per backend.
+    """
+
+    def __init__(self, limits=None, backoff_base=BACKOFF_BASE_SECONDS):
+        self.backoff_base = backoff_base
+        self.metrics = Metrics()
+        self._backends = {}
+        self._limits = {name: dict(value) for name, value in (limits or DEFAULT_LIMITS).items()}
+        self._lock = threading.Lock()
+
+    def _backend(self, name):
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is None:
+                limits = self._limits.get(name, FALLBACK_LIMITS)
+                backend = self._backends[name] = _Backend(name, limits)
+            return backend
+
+    def configure(self, name, **limits):
+        """Ubah batas satu backend (berlaku untuk request berikutnya)"""
+        with self._lock:
+            self._limits[name] = {**self._limits.get(name, FALLBACK_LIMITS),
+                                  **limits}
+            self._backends.pop(name, None)
+
+    @contextmanager
+    def slot(self, name, priority=INTERACTIVE, tokens=0):
+        """Pegang satu permit backend (setelah lolos rate limit) selama blok berjalan.
+
+        Bucket request/token per menit ditunggu lebih dulu (berurutan prioritas lewat
+        rate_gate), jadi request yang tertahan rate limit tidak memegang permit backend.
+        """
+        backend = self._backend(name)
+        self.metrics.incr(f"{name}.requests")
+        start = time.perf_counter()
+        with self._lock:
+            backend.max_queued = max(backend.max_queued, backend.slots.waiting + 1)
+        if backend.rate_gate is not None:
+            backend.rate_gate.acquire(priority)
+            try:
+                waited = backend.requests.acquire(1) if backend.requests is not None else 0.0
+                if backend.tokens is not None and tokens:
+                    waited += backend.tokens.acquire(tokens)
+            finally:
+                backend.rate_gate.release()
+            if waited:
+                self.metrics.incr(f"{name}.rate_limited")
+        backend.slots.acquire(priority)
+        try:
+            lane = "interactive" if priority <= INTERACTIVE else "batch"
+            self.metrics.observe(f"{name}.queue_wait.{lane}", time.perf_counter() - start)
+            with self.metrics.timer(f"{name}.run"):
+                yield backend
+        finally:
+            backend.slots.release()
+
+    def _backoff(self, name, attempt, error):
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = min(BACKOFF_MAX_SECONDS, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+        self.metrics.incr(f"{name}.retries")
+        log.warning(f"[WARN] {name}: {error} -> coba lagi dalam {delay:.1f} s")
+        time.sleep(delay)
+
+    def call(self, name, fn, priority=INTERACTIVE, prompt_tokens=0):
+        """Jalankan fn() lewat antrean backend; error sementara dicoba ulang (tanpa memegang permit)"""
+        retries = self._backend(name).limits.get("retries", 0)
+        for attempt in range(retries + 1):
+            try:
+                with self.slot(name, priority, prompt_tokens) as backend:
+                    result = fn()
+                if backend.tokens is not None and isinstance(result, str):
+                    backend.tokens.charge(estimate_tokens(result))
+                return result
+            except Exception as e:
+                if attempt >= retries or not is_retryable(e):
+                    self.metrics.incr(f"{name}.failed")
+                    raise
+                self._backoff(name, attempt, e)
+
+    def stream(self, name, stream_fn, priority=INTERACTIVE, prompt_tokens=0):
+        """Versi streaming call(): yield potongan dari stream_fn(). Retry hanya jika error
+        terjadi sebelum potongan pertama (yang sudah dikirim tidak bisa ditarik)."""
+        retries = self._backend(name).limits.get("retries", 0)
+        for attempt in range(retries + 1):
+            produced = 0
+            try:
+                with self.slot(name, priority, prompt_tokens) as backend:
+                    for piece in stream_fn():
+                        produced += len(piece)
+                        yield piece
+                if backend.tokens is not None:
+                    backend.tokens.charge(-(-produced // CHARS_PER_TOKEN))
+                return
+            except Exception as e:
+                if produced or attempt >= retries or not is_retryable(e):
+                    self.metrics.incr(f"{name}.failed")
+                    raise
+                self._backoff(name, attempt, e)
+
+    def stats(self):
+        """Ringkasan per backend (antrean saat ini & maksimum, request aktif) + counter/timer"""
+        with self._lock:
+            backends = {name: {"limits": dict(backend.limits), "in_flight": backend.slots.in_use,
+                               "queued": backend.slots.waiting, "max_queued": backend.max_queued}
+                        for name, backend in self._backends.items()}
+        return {"backends": backends, **self.metrics.summary()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Scheduler bersama (per proses): semua pemanggilan LLM lewat sini"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+    return _scheduler
+
+
+# ==========================================
+# BACKEND MOCK (UJI OFFLINE)
+# ==========================================
+class MockBackend:
+    """Backend tiruan: latensi tetap, `failures` pemanggilan pertama gagal (RetryableError),
+    jawaban deterministik. Mencatat jumlah request bersamaan maksimum."""
+
+    def __init__(self, latency=0.05, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = self.calls <= self.failures
+        try:
+            time.sleep(self.latency)
+            if fail:
+                raise RetryableError("429 mock rate limit")
+            return f"mock: {prompt[:40]}"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Simulasi beban scheduler LLM dengan backend mock")
+    parser.add_argument("--batch", type=int, default=20, help="Jumlah request batch")
+    parser.add_argument("--interactive", type=int, default=4, help="Jumlah request interaktif (datang belakangan)")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--rpm", type=float, default=0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failures", type=int, default=2, help="Jumlah request pertama yang gagal (untuk retry)")
+    args = parser.parse_args()
+
+    scheduler = LLMScheduler(backoff_base=0.05)
+    scheduler.configure("mock", concurrency=args.concurrency, rpm=args.rpm)
+    backend = MockBackend(args.latency, args.failures)
+    finished = []
+
+    def job(lane, index):
+        priority = INTERACTIVE if lane == "interactive" else BATCH
+        scheduler.call("mock", lambda: backend(f"{lane}-{index}"), priority)
+        finished.append(f"{lane}-{index}")
+
+    with ThreadPoolExecutor(args.batch + args.interactive) as executor:
+        for index in range(args.batch):
+            executor.submit(job, "batch", index)
+        time.sleep(args.latency / 2)
+        for index in range(args.interactive):
+            executor.submit(job, "interactive", index)
+
+    positions = [i for i, name in enumerate(finished) if name.startswith("interactive")]
+    print(json.dumps({"interactive_finish_positions": positions, "backend_calls": backend.calls,
+                      "backend_max_active": backend.max_active, **scheduler.stats()}, indent=4))
@@ -0,0 +1,139 @@
+# Lokasi: core/metrics.py
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOGGER_NAME = "manualbook"
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+
+def get_logger(name=None):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+def configure_logging(level="INFO"):
+    """Satu handler stdout dengan format polos (sama seperti output print sebelumnya)"""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+
+class Metrics:
+    """Counter + timer ringan untuk hot path, opsional dengan span untuk trace.
+
+    Counter dan timer selalu aktif (biayanya hanya penjumlahan dict). Span
+    hanya dicatat jika trace=True, dan bisa diekspor ke format Chrome Trace
+    Event (dibuka di chrome://tracing atau ui.perfetto.dev).
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.counters = {}
+        self.timers = {}
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stat = self.timers.get(name)
+            if stat is None:
+                self.timers[name] = {"count": 1, "total_seconds": seconds, "max_seconds": seconds}
+            else:
+                stat["count"] += 1
+                stat["total_seconds"] += seconds
+                stat["max_seconds"] = max(stat["max_seconds"], seconds)
+
+    @contextmanager
+    def timer(self, name, **args):
+        """Ukur durasi blok; `args` hanya disimpan di span (mis. file, halaman)"""
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(name, elapsed)
+            if self.trace:
+                self.add_span(name, start_ns, elapsed, args)
+
+    def timed_iter(self, iterable, name, **args):
+        """Bungkus generator: waktu setiap next() dicatat sebagai satu observasi `name`"""
+        iterator = iter(iterable)
+        index = 0
+        while True:
+            start_ns = time.time_ns()
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            elapsed = time.perf_counter() - start
+            self.observe(name, elapsed)
+            index += 1
+            if self.trace:
+                self.add_span(name, start_ns, elapsed, {**args, "index": index})
+            yield item
+
+    def add_span(self, name, start_ns, seconds, args=None):
+        with self._lock:
+            self.spans.append({
+                "name": name, "ph": "X", "ts": start_ns // 1000, "dur": int(seconds * 1e6),
+                "pid": os.getpid(), "tid": threading.get_ident(), "args": args or {},
+            })
+
+    def to_dict(self):
+        with self._lock:
+            return {"counters": dict(self.counters), "timers": {k: dict(v) for k, v in self.timers.items()},
+                    "spans": list(self.spans)}
+
+    def drain(self):
+        """Ambil isi metrics lalu reset (dipakai worker untuk mengirim per dokumen)"""
+        with self._lock:
+            data = {"counters": self.counters, "timers": self.timers, "spans": self.spans}
+            self.counters, self.timers, self.spans = {}, {}, []
+        return data
+
+    def merge(self, data):
+        """Gabungkan hasil to_dict()/drain() dari proses lain"""
+        with self._lock:
+            for name, value in data["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, stat in data["timers"].items():
+                own = self.timers.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+                own["count"] += stat["count"]
+                own["total_seconds"] += stat["total_seconds"]
+                own["max_seconds"] = max(own["max_seconds"], stat["max_seconds"])
+            if self.trace:
+                self.spans.extend(data["spans"])
+
+    def summary(self):
+        data = self.to_dict()
+        timers = {}
+        for name, stat in sorted(data["timers"].items()):
+            timers[name] = {
+                "count": stat["count"],
+                "total_seconds": round(stat["total_seconds"], 4),
+                "mean_seconds": round(stat["total_seconds"] / stat["count"], 4) if stat["count"] else 0.0,
+                "max_seconds": round(stat["max_seconds"], 4),
+            }
+        return {"counters": dict(sorted(data["counters"].items())), "timers": timers}
+
+    def write_json(self, path, **extra):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**extra, **self.summary()}, f, indent=4, ensure_ascii=False)
+
+    def write_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": self.spans, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
@@ -1,17 +1,41 @@
-import google.generativeai as genai
 import os
 import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from core.llm import gemini_generate, parse_partial_json, strip_code_fences
+from core.llm_scheduler import BATCH, INTERACTIVE, get_scheduler
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-def normalize_text_to_json(raw_text):
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    prompt = f"""
+# Satu prompt maksimal sebesar ini (karakter teks OCR); dokumen lebih besar dipecah per halaman/bagian
+CHUNK_CHARS = int(os.environ.get("NORMALIZE_CHUNK_CHARS", "12000"))
+MAX_WORKERS = int(os.environ.get("NORMALIZE_WORKERS", "4"))
+PAGE_SEPARATOR = "\f"
+# Baris yang tampak seperti awal bagian: "BAB 2", "3.1 Judul", "IV. Judul"
+SECTION_HEADING_PATTERN = re.compile(r'^\s*(BAB\s+\w+|CHAPTER\s+\w+|\d+(\.\d+)*\.?\s+\S|[IVX]+\.\s+\S)', re.IGNORECASE)
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def _configure_gemini():
+    # Import genai di sini: mode chunked dengan backend stub tidak butuh paket Gemini
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _configured = True
+
+def build_prompt(raw_text, part=None, total=None):
+    part_note = ""
+    if total and total > 1:
+        part_note = f"\n    This is part {part} of {total} of the same manual; convert only this part.\n"
+    return f"""
     You are a data normalization expert. Convert the following messy OCR text from a manual book into a clean JSON format.
-    
+    {part_note}
     Rules:
     1. Identify titles, section headers, and values.
     2. If there are tables, represent them as a list of objects.
@@ -21,9 +45,221 @@ def normalize_text_to_json(raw_text):
     OCR TEXT:
     {raw_text}
     """
-    
-    response = model.generate_content(prompt)
-    
-    # Clean up markdown if the model wraps it in ```json
-    clean_json = response.text.replace("```json", "").replace("```", "").strip()
-    return json.loads(clean_json)
\ No newline at end of file
+
+def parse_json_tolerant(text):
+    """json.loads yang toleran: buang ```json, abaikan teks di luar JSON, dan pulihkan
+    JSON yang terpotong (jawaban kena batas token). Return None jika tidak ada JSON."""
+    text = strip_code_fences(text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(text[min(starts):])[0]
+    except ValueError:
+        return parse_partial_json(text)
+
+
+# ==========================================
+# CHUNKING
+# ==========================================
+def split_units(raw_text):
+    """Unit terkecil yang tidak dipotong: halaman (dipisah \\f) atau bagian (judul bernomor)"""
+    if PAGE_SEPARATOR in raw_text:
+        return [page for page in raw_text.split(PAGE_SEPARATOR) if page.strip()]
+    units, current = [], []
+    for line in raw_text.splitlines():
+        if current and SECTION_HEADING_PATTERN.match(line):
+            units.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        units.append("\n".join(current))
+    return [unit for unit in units if unit.strip()]
+
+def split_into_chunks(raw_text, max_chars=CHUNK_CHARS):
+    """Gabungkan halaman/bagian berurutan menjadi chunk <= max_chars.
+    `raw_text` boleh string atau list teks per halaman. Unit yang lebih besar dari
+    max_chars dipecah per baris."""
+    units = [page for page in raw_text if page.strip()] if isinstance(raw_text, list) else split_units(raw_text)
+    chunks, current, size = [], [], 0
+    for unit in units:
+        pieces = [unit] if len(unit) <= max_chars else _split_lines(unit, max_chars)
+        for piece in pieces:
+            if current and size + len(piece) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def _split_lines(text, max_chars):
+    pieces, current, size = [], [], 0
+    for line in text.splitlines():
+        line = line[:max_chars]
+        if current and size + len(line) + 1 > max_chars:
+            pieces.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+# ==========================================
+# MERGE (DETERMINISTIK, URUT CHUNK)
+# ==========================================
+def merge_values(base, extra):
+    """Aturan merge: dict digabung per key (rekursif), list disambung (duplikat persis
+    dibuang), nilai skalar dari chunk paling awal yang tidak kosong dipertahankan."""
+    if isinstance(base, dict) and isinstance(extra, dict):
+        merged = dict(base)
+        for key, value in extra.items():
+            merged[key] = merge_values(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(base, list) and isinstance(extra, list):
+        merged = list(base)
+        for item in extra:
+            if item not in merged:
+                merged.append(item)
+        return merged
+    if base in (None, "", [], {}):
+        return extra
+    if isinstance(base, list) or isinstance(extra, list):
+        return merge_values(base if isinstance(base, list) else [base], extra if isinstance(extra, list) else [extra])
+    return base
+
+def merge_chunk_results(results):
+    """Gabungkan hasil per chunk (urut chunk) menjadi satu dokumen JSON"""
+    merged = None
+    for result in results:
+        if result is None:
+            continue
+        if merged is None:
+            merged = result
+        elif isinstance(merged, dict) and not isinstance(result, dict):
+            merged = merge_values(merged, {"isi_materi": result if isinstance(result, list) else [result]})
+        elif isinstance(merged, list) and isinstance(result, dict):
+            merged = merge_values({"isi_materi": merged}, result)
+        else:
+            merged = merge_values(merged, result)
+    return merged if merged is not None else {}
+
+
+# ==========================================
+# BACKEND
+# ==========================================
+def gemini_backend(model='gemini-1.5-flash', bypass_cache=False, priority=INTERACTIVE):
+    """backend(prompt) -> teks jawaban; lewat cache LLM, lalu scheduler (kuota Gemini) jika cache kosong"""
+    def call(prompt):
+        _configure_gemini()
+        return gemini_generate(prompt, model, bypass=bypass_cache, priority=priority)
+    return call
+
+def stub_backend(delay=0.0, priority=INTERACTIVE):
+    """Backend lokal untuk pengujian tanpa API: teks chunk -> JSON deterministik
+    (baris pertama jadi judul, sisanya isi_materi), dibungkus ```json seperti Gemini.
+    Tetap lewat scheduler (backend "mock") agar antrean & batasnya ikut teruji."""
+    def answer(prompt):
+        time.sleep(delay)
+        text = prompt.split("OCR TEXT:", 1)[-1]
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        data = {"judul_dokumen": lines[0] if lines else "", "isi_materi": lines[1:]}
+        return "```json\n" + json.dumps(data, ensure_ascii=False, indent=2) + "\n```"
+
+    def call(prompt):
+        return get_scheduler().call("mock", lambda: answer(prompt), priority)
+    return call
+
+
+# ==========================================
+# NORMALISASI
+# ==========================================
+def normalize_document(raw_text, backend=None, max_chars=CHUNK_CHARS, workers=MAX_WORKERS,
+                       bypass_cache=False, return_report=False, priority=INTERACTIVE):
+    """Normalisasi dokumen besar: pecah per halaman/bagian, tiap chunk dinormalisasi
+    paralel (maks. `workers`; kuota & retry diatur scheduler LLM), lalu hasil digabung urut chunk.
+
+    Chunk yang gagal (error API / jawaban tanpa JSON) dilewati; detailnya ada di report
+    (return_report=True -> (hasil, report)).
+    """
+    backend = backend or gemini_backend(bypass_cache=bypass_cache, priority=priority)
+    chunks = split_into_chunks(raw_text, max_chars)
+
+    def run(index):
+        start = time.perf_counter()
+        entry = {"chunk": index, "chars": len(chunks[index])}
+        try:
+            result = parse_json_tolerant(backend(build_prompt(chunks[index], index + 1, len(chunks))))
+            if result is None:
+                entry["error"] = "Jawaban tanpa JSON"
+        except Exception as e:
+            result = None
+            entry["error"] = str(e)
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+        return result, entry
+
+    start = time.perf_counter()
+    workers = max(1, min(workers, len(chunks)))
+    if workers == 1:
+        outputs = [run(index) for index in range(len(chunks))]
+    else:
+        with ThreadPoolExecutor(workers, thread_name_prefix="normalize") as executor:
+            outputs = list(executor.map(run, range(len(chunks))))
+
+    merged = merge_chunk_results(result for result, _ in outputs)
+    if not return_report:
+        return merged
+    report = {"chunks": [entry for _, entry in outputs], "wall_seconds": round(time.perf_counter() - start, 3),
+              "failed": sum(1 for _, entry in outputs if "error" in entry)}
+    return merged, report
+
+def normalize_text_to_json(raw_text, bypass_cache=False, backend=None):
+    """Teks kecil: satu prompt seperti sebelumnya. Teks > CHUNK_CHARS otomatis memakai mode chunked."""
+    if len(raw_text) > CHUNK_CHARS:
+        return normalize_document(raw_text, backend, bypass_cache=bypass_cache)
+
+    # Prompt yang sama (halaman yang sama) dijawab dari cache LLM
+    backend = backend or gemini_backend(bypass_cache=bypass_cache)
+    response_text = backend(build_prompt(raw_text))
+
+    # Parser yang sama dengan mode chunked: ```json, teks di luar JSON, JSON terpotong
+    result = parse_json_tolerant(response_text)
+    if result is None:
+        raise ValueError("Jawaban model tidak berisi JSON")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    from core.extractor import PDFExtractor
+
+    parser = argparse.ArgumentParser(description="Normalisasi satu manual (PDF) ke JSON lewat LLM, per chunk")
+    parser.add_argument("pdf")
+    parser.add_argument("--output", default=None, help="File JSON hasil (default: <pdf>.json)")
+    parser.add_argument("--backend", choices=["gemini", "stub"], default="gemini")
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--rpm", type=float, default=None, help="Batas request Gemini per menit (default: GEMINI_RPM)")
+    parser.add_argument("--no-cache", action="store_true", help="Abaikan cache LLM")
+    args = parser.parse_args()
+
+    pages = [page["text"] for page in PDFExtractor(args.pdf).extract_document()]
+    if args.rpm is not None:
+        get_scheduler().configure("gemini", rpm=args.rpm)
+    # Job CLI = lane batch: request interaktif (Streamlit) di proses yang sama didahulukan
+    if args.backend == "stub":
+        backend = stub_backend(priority=BATCH)
+    else:
+        backend = gemini_backend(bypass_cache=args.no_cache, priority=BATCH)
+    data, report = normalize_document(pages, backend, args.chunk_chars, args.workers, return_report=True)
+    output = args.output or os.path.splitext(args.pdf)[0] + ".json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    print(f"[INFO] {len(report['chunks'])} chunk, {report['failed']} gagal, {report['wall_seconds']} s -> {output}")
@@ -0,0 +1,98 @@
+# Lokasi: core/ocr_cache.py
+import hashlib
+import json
+import os
+import time
+
+from core.sqlite_cache import SQLiteCache, cache_parser, run_cli, shared_cache
+
+DEFAULT_CACHE_PATH = os.environ.get("OCR_CACHE_PATH", os.path.join("temp_assets", "ocr_cache.sqlite"))
+# Batas ukuran isi cache (byte JSON hasil OCR); entri paling lama tidak dipakai dibuang dulu
+DEFAULT_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def region_key(clip):
+    """Kunci area halaman: '' untuk satu halaman penuh, selain itu bbox dibulatkan"""
+    if clip is None: return ""
+    return ",".join(f"{value:.1f}" for value in tuple(clip))
+
+
+class OCRCache(SQLiteCache):
+    """Cache hasil OCR di SQLite, kunci (hash PDF, halaman, skala, engine, area).
+
+    Nilai yang disimpan: list baris OCR {"box", "text", "confidence"}.
+    Satu koneksi dipakai bersama dengan lock, jadi aman dipanggil dari thread mana pun.
+    """
+
+    TABLE = "ocr_results"
+    COLUMNS = """
+        doc_hash TEXT NOT NULL,
+        page INTEGER NOT NULL,
+        scale REAL NOT NULL,
+        engine TEXT NOT NULL,
+        region TEXT NOT NULL,
+        lines TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (doc_hash, page, scale, engine, region)"""
+    KEY_COLUMNS = ("doc_hash", "page", "scale", "engine", "region")
+    INDEX = "idx_ocr_last_access"
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+
+    def get(self, doc_hash, page, scale, engine, region=""):
+        key = (doc_hash, page, round(scale, 2), engine, region)
+        with self._lock:
+            row = self._conn.execute(f"SELECT lines FROM ocr_results WHERE {self._key_where}", key).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._touch(key)
+        return json.loads(row[0])
+
+    def put(self, doc_hash, page, scale, engine, region, lines):
+        blob = json.dumps(lines, ensure_ascii=False)
+        now = time.time()
+        self._insert((doc_hash, page, round(scale, 2), engine, region, blob, len(blob.encode('utf-8')), now, now))
+
+    def invalidate(self, doc_hash=None):
+        """Hapus cache satu dokumen (hash PDF), atau seluruh cache jika doc_hash=None. Return jumlah entri."""
+        if doc_hash is None:
+            return self._delete()
+        return self._delete("doc_hash=?", (doc_hash,))
+
+    def summary(self):
+        with self._lock:
+            docs = self._conn.execute("SELECT COUNT(DISTINCT doc_hash) FROM ocr_results").fetchone()[0]
+        return {**super().summary(), "documents": docs}
+
+
+# Cache bersama (per proses) di DEFAULT_CACHE_PATH
+get_ocr_cache = shared_cache(OCRCache)
+
+
+def _invalidate(cache, args):
+    if args.all:
+        print(f"[INFO] {cache.invalidate()} entri dihapus")
+    else:
+        for pdf in args.pdf:
+            print(f"[INFO] {pdf}: {cache.invalidate(file_sha256(pdf))} entri dihapus")
+
+
+if __name__ == "__main__":
+    parser, sub = cache_parser("Kelola cache hasil OCR", DEFAULT_CACHE_PATH)
+    invalidate = sub.add_parser("invalidate", help="Hapus cache untuk PDF tertentu atau semuanya")
+    target = invalidate.add_mutually_exclusive_group(required=True)
+    target.add_argument("--pdf", nargs="+", help="PDF yang cache-nya dihapus (dicocokkan lewat hash isi)")
+    target.add_argument("--all", action="store_true", help="Hapus seluruh cache")
+    run_cli(parser, OCRCache, {"invalidate": _invalidate})
@@ -0,0 +1,145 @@
+# Lokasi: core/ocr_pool.py
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Matikan semua log sistem agar tidak bentrok dengan Streamlit
+logging.getLogger("ppocr").setLevel(logging.ERROR)
+
+# --- FLAG STABILITAS MUTLAK (Wajib untuk Windows + Python 3.13) ---
+os.environ['FLAGS_use_mkldnn'] = '0'
+os.environ['FLAGS_enable_pir_api'] = '0'
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+os.environ['FLAGS_allocator_strategy'] = 'naive_best_fit' # Memperbaiki masalah memori
+
+# Jumlah maksimum engine per (bahasa, opsi). Satu engine PaddleOCR memakan
+# ratusan MB, jadi default 1; naikkan lewat env jika RAM cukup.
+DEFAULT_POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", "1"))
+
+# Hanya parameter paling dasar (jangan tambahkan use_gpu atau show_log)
+DEFAULT_OPTIONS = {"use_angle_cls": True, "enable_mkldnn": False}
+
+def paddleocr_version():
+    """Versi paket paddleocr tanpa meng-import paddle (mahal)"""
+    try:
+        from importlib.metadata import version
+        return version("paddleocr")
+    except Exception:
+        return "unknown"
+
+
+class OCREnginePool:
+    """Pool engine PaddleOCR yang sudah dimuat untuk satu kombinasi bahasa + opsi.
+
+    Engine dibuat saat dibutuhkan sampai `max_size`; setelah itu peminjam
+    menunggu engine dikembalikan. Satu engine hanya dipakai satu thread
+    dalam satu waktu.
+    """
+
+    def __init__(self, options, max_size=DEFAULT_POOL_SIZE):
+        self.options = dict(options)
+        self.max_size = max(1, max_size)
+        self._idle = []
+        self._created = 0  # Termasuk engine yang sedang dimuat
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "checkouts": 0, "waits": 0, "load_seconds": 0.0}
+        # Identitas engine (versi + opsi) untuk kunci cache hasil OCR
+        self.engine_id = f"paddleocr-{paddleocr_version()}|" + json.dumps(self.options, sort_keys=True)
+
+    def _create_engine(self):
+        from paddleocr import PaddleOCR
+
+        start = time.perf_counter()
+        try:
+            engine = PaddleOCR(**self.options)
+        except Exception as e:
+            print(f"Gagal inisialisasi PaddleOCR: {e}")
+            raise
+        with self._cond:
+            self.stats["created"] += 1
+            self.stats["load_seconds"] += time.perf_counter() - start
+        return engine
+
+    def acquire(self, timeout=None):
+        with self._cond:
+            while not self._idle and self._created >= self.max_size:
+                self.stats["waits"] += 1
+                if not self._cond.wait(timeout):
+                    raise TimeoutError("Tidak ada engine OCR yang bebas")
+            self.stats["checkouts"] += 1
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        # Muat engine baru di luar lock agar peminjam lain tidak ikut terblokir
+        try:
+            return self._create_engine()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, engine):
+        with self._cond:
+            self._idle.append(engine)
+            self._cond.notify()
+
+    @contextmanager
+    def engine(self, timeout=None):
+        """with pool.engine() as ocr: ocr.ocr(img)"""
+        engine = self.acquire(timeout)
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def warm_up(self, count=1):
+        """Muat engine sampai `count` (maks. max_size) engine tersedia; idempoten"""
+        with self._cond:
+            missing = max(0, min(count, self.max_size) - self._created)
+            self._created += missing  # Pesan slot dulu agar pemanggilan paralel tidak memuat dobel
+        for _ in range(missing):
+            try:
+                engine = self._create_engine()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+            self.release(engine)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_ocr_pool(lang='id', max_size=None, **options):
+    """Pool bersama (per proses) untuk bahasa + opsi tertentu"""
+    options = {**DEFAULT_OPTIONS, **options, "lang": lang}
+    key = tuple(sorted(options.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = OCREnginePool(options, max_size or DEFAULT_POOL_SIZE)
+    return pool
+
+def warm_up_ocr(lang='id', count=1, background=False, **options):
+    """Hook startup: muat engine sekali per proses, opsional di thread latar.
+
+    Pemanggilan berulang (mis. setiap rerun Streamlit) tidak memuat ulang model.
+    """
+    pool = get_ocr_pool(lang, **options)
+    if not background:
+        pool.warm_up(count)
+        return pool
+
+    def run():
+        try:
+            pool.warm_up(count)
+        except Exception:
+            pass  # Error akan muncul lagi saat engine benar-benar dipinjam
+    threading.Thread(target=run, name="ocr-warm-up", daemon=True).start()
+    return pool
@@ -0,0 +1,135 @@
+# Lokasi: core/pictogram_cache.py
+import hashlib
+import os
+import time
+
+from core.sqlite_cache import SQLiteCache, cache_parser, run_cli, shared_cache
+
+DEFAULT_CACHE_PATH = os.environ.get("PICTOGRAM_CACHE_PATH", os.path.join("temp_assets", "pictogram_cache.sqlite"))
+DEFAULT_MAX_BYTES = int(os.environ.get("PICTOGRAM_CACHE_MAX_MB", "128")) * 1024 * 1024
+# Render kecil untuk hash (zoom 1 = 72 dpi) dan ukuran grid dHash (HASH_SIZE x HASH_SIZE bit)
+HASH_ZOOM = 1
+HASH_SIZE = 16
+# Sel yang (hampir) polos: selisih terang-gelap render kecil di bawah ini tidak pernah di-cache
+FLAT_RANGE = 16
+
+
+def pictogram_key(page_fitz, bbox, zoom, hash_zoom=HASH_ZOOM, hash_size=HASH_SIZE):
+    """Kunci cache untuk crop area bbox pada zoom tertentu, atau None untuk sel polos/kosong.
+
+    Kunci = (dHash render grayscale resolusi rendah, ukuran crop dalam pt, zoom,
+    SHA1 byte render rendah). dHash hanya mempercepat pencarian; hit harus
+    cocok persis di semua bagian, jadi simbol berbeda tidak bisa saling tertukar.
+    """
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    pix = page_fitz.get_pixmap(matrix=fitz.Matrix(hash_zoom, hash_zoom), clip=bbox,
+                               colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride)
+    low, high = img.getextrema()
+    if high - low < FLAT_RANGE:
+        return None
+
+    small = img.resize((hash_size + 1, hash_size), Image.BILINEAR).tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (small[offset + col] > small[offset + col + 1])
+    x0, top, x1, bottom = tuple(bbox)
+    size = f"{x1 - x0:.1f}x{bottom - top:.1f}"
+    digest = hashlib.sha1(img.tobytes()).hexdigest()
+    return f"{bits:0{hash_size * hash_size // 4}x}", size, float(zoom), digest
+
+
+class PictogramCache(SQLiteCache):
+    """Cache PNG piktogram (crop resolusi tinggi) lintas manual, di SQLite.
+
+    Kunci: pictogram_key (dHash + ukuran crop + zoom + hash persis render kecil).
+    Simbol standar (CE, IP, tipe BF, WEEE) yang muncul di banyak manual cukup
+    dirender & di-encode sekali; setelah itu byte PNG yang sama dipakai ulang,
+    sehingga python-docx (dedup per SHA1) juga hanya menyimpan satu gambar per dokumen.
+    """
+
+    TABLE = "pictogram_renders"
+    COLUMNS = """
+        phash TEXT NOT NULL,
+        size TEXT NOT NULL,
+        zoom REAL NOT NULL,
+        digest TEXT NOT NULL,
+        png BLOB NOT NULL,
+        bytes INTEGER NOT NULL,
+        created REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (phash, size, zoom, digest)"""
+    KEY_COLUMNS = ("phash", "size", "zoom", "digest")
+    SIZE_COLUMN = "bytes"
+    INDEX = "idx_picto_last_access"
+    STATS = ("hits", "misses", "writes", "evicted", "rejected", "uncacheable")
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+        self._memory = {}
+
+    def get(self, key):
+        """PNG untuk kunci pictogram_key, atau None. Entri dengan dHash, ukuran & zoom sama
+        tetapi render rendah berbeda dihitung sebagai 'rejected' (bukan hit)."""
+        with self._lock:
+            png = self._memory.get(key)
+            if png is None:
+                rows = self._conn.execute(
+                    "SELECT digest, png FROM pictogram_renders WHERE phash=? AND size=? AND zoom=?", key[:3]
+                ).fetchall()
+                png = next((bytes(blob) for digest, blob in rows if digest == key[3]), None)
+                if png is None:
+                    self.stats["misses"] += 1
+                    if rows:
+                        self.stats["rejected"] += 1
+                    return None
+                self._memory[key] = png
+                self._touch(key)
+            self.stats["hits"] += 1
+        return png
+
+    def put(self, key, png):
+        now = time.time()
+        with self._lock:
+            self._memory[key] = png
+        self._insert(key + (png, len(png), now, now))
+
+    def get_or_render(self, page_fitz, bbox, zoom, render):
+        """PNG untuk area bbox: dari cache jika kuncinya cocok persis, selain itu
+        render(page, bbox, zoom) lalu simpan. Sel polos/kosong selalu dirender ulang."""
+        key = pictogram_key(page_fitz, bbox, zoom)
+        if key is None:
+            self.count("uncacheable")
+            return render(page_fitz, bbox, zoom)
+        png = self.get(key)
+        if png is None:
+            png = render(page_fitz, bbox, zoom)
+            self.put(key, png)
+        return png
+
+    def _forget(self, key):
+        self._memory.pop(key, None)
+
+    def invalidate(self):
+        """Hapus seluruh cache. Return jumlah entri."""
+        with self._lock:
+            self._memory.clear()
+        return self._delete()
+
+
+# Cache bersama (per proses) di DEFAULT_CACHE_PATH
+get_pictogram_cache = shared_cache(PictogramCache)
+
+
+def _invalidate(cache, args):
+    print(f"[INFO] {cache.invalidate()} entri dihapus")
+
+
+if __name__ == "__main__":
+    parser, sub = cache_parser("Kelola cache piktogram simbol", DEFAULT_CACHE_PATH)
+    sub.add_parser("invalidate", help="Hapus seluruh cache")
+    run_cli(parser, PictogramCache, {"invalidate": _invalidate})
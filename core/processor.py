@@ -1,28 +1,113 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 
-def clean_medical_element(img_path):
-    img = cv2.imread(img_path)
-    if img is None:
-        return
+# Range warna Merah (HSV OpenCV, H 0-180): H 0-10 atau 170-180, S & V >= 50
+RED_HUE_RANGES = ((0, 10), (170, 180))
+RED_MIN_SAT = 50
+RED_MIN_VAL = 50
+
+# Satu LUT hue untuk kedua range merah (menggantikan dua inRange + bitwise_or)
+RED_HUE_LUT = np.zeros(256, np.uint8)
+for _low, _high in RED_HUE_RANGES:
+    RED_HUE_LUT[_low:_high + 1] = 255
+
+# Pre-check di versi kecil gambar (sisi terpanjang ~256 px). Ambang S/V sangat longgar
+# karena downsample INTER_AREA mencampur garis merah tipis dengan latar putih/hitam.
+# Yang bisa terlewat hanya piksel merah tunggal (anti-aliasing) di antara warna lain,
+# jadi pre-check hanya dipakai jika diminta (precheck=True); default = pass penuh, hasil persis.
+PRECHECK_MAX_SIDE = 256
+PRECHECK_MIN_SAT = 3
+PRECHECK_MIN_VAL = 10
+
+DILATE_KERNEL = np.ones((3,3), np.uint8)
+
+def red_mask(img, min_sat=RED_MIN_SAT, min_val=RED_MIN_VAL):
+    """Mask merah (0/255) dari gambar BGR"""
+    h, s, v = cv2.split(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+    mask = cv2.LUT(h, RED_HUE_LUT)
+    cv2.bitwise_and(mask, cv2.threshold(s, min_sat - 1, 255, cv2.THRESH_BINARY)[1], dst=mask)
+    cv2.bitwise_and(mask, cv2.threshold(v, min_val - 1, 255, cv2.THRESH_BINARY)[1], dst=mask)
+    return mask
+
+def red_roi(img):
+    """Area (x, y, w, h) yang perlu diproses penuh, dari pre-check di gambar kecil; None jika tidak ada merah"""
+    height, width = img.shape[:2]
+    k = -(-max(height, width) // PRECHECK_MAX_SIDE)
+    if k <= 1:
+        return (0, 0, width, height)
+
+    # Faktor bulat: INTER_AREA memakai jalur cepat
+    hk, wk = height // k * k, width // k * k
+    small = cv2.resize(img[:hk, :wk], (wk // k, hk // k), interpolation=cv2.INTER_AREA)
+    boxes = []
+    mask = red_mask(small, PRECHECK_MIN_SAT, PRECHECK_MIN_VAL)
+    if cv2.countNonZero(mask):
+        x, y, w, h = cv2.boundingRect(mask)
+        boxes.append((x * k, y * k, (x + w) * k, (y + h) * k))
 
-    # Konversi ke HSV untuk deteksi warna merah yang akurat
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    # Sisa tepi kanan/bawah (< k px) yang tidak ikut di-downsample dicek langsung
+    for x0, y0, strip in ((wk, 0, img[:, wk:]), (0, hk, img[hk:, :wk])):
+        if strip.size:
+            mask = red_mask(strip)
+            if cv2.countNonZero(mask):
+                x, y, w, h = cv2.boundingRect(mask)
+                boxes.append((x0 + x, y0 + y, x0 + x + w, y0 + y + h))
+    if not boxes:
+        return None
 
-    # Range warna Merah
-    lower_red1 = np.array([0, 50, 50])
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([170, 50, 50])
-    upper_red2 = np.array([180, 255, 255])
+    # Margin: ketidakpastian posisi dari downsample + 1 px untuk dilation
+    pad = k + 1
+    x0 = max(0, min(box[0] for box in boxes) - pad)
+    y0 = max(0, min(box[1] for box in boxes) - pad)
+    x1 = min(width, max(box[2] for box in boxes) + pad)
+    y1 = min(height, max(box[3] for box in boxes) + pad)
+    return (x0, y0, x1 - x0, y1 - y0)
 
-    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    red_mask = cv2.bitwise_or(mask1, mask2)
+def remove_red_stamp(img, precheck=False):
+    """Hapus stempel/elemen merah dari gambar BGR (in-place). Return True jika ada piksel yang diubah.
+
+    Dengan precheck=True, gambar tanpa merah dilewati dan pass resolusi penuh
+    hanya dijalankan di area yang mengandung merah (lebih cepat, tapi piksel merah
+    tunggal hasil anti-aliasing bisa terlewat).
+    """
+    if img is None or img.ndim != 3 or img.shape[2] != 3:
+        return False
+    roi = red_roi(img) if precheck else (0, 0, img.shape[1], img.shape[0])
+    if roi is None:
+        return False
+
+    x, y, w, h = roi
+    view = img[y:y + h, x:x + w]
+    mask = red_mask(view)
+    if not cv2.countNonZero(mask):
+        return False
 
     # Dilation untuk memastikan pinggiran stempel juga terhapus
-    kernel = np.ones((3,3), np.uint8)
-    red_mask = cv2.dilate(red_mask, kernel, iterations=1)
+    mask = cv2.dilate(mask, DILATE_KERNEL, iterations=1)
 
     # Ubah area merah menjadi putih
-    img[red_mask > 0] = [255, 255, 255]
-    cv2.imwrite(img_path, img)
\ No newline at end of file
+    view[mask > 0] = (255, 255, 255)
+    return True
+
+def clean_medical_elements(images, workers=None, precheck=False):
+    """Versi batch: hapus merah dari banyak crop (array BGR, diubah in-place) di thread pool.
+
+    OpenCV melepas GIL, jadi thread cukup. Return list bool (crop mana yang berubah).
+    """
+    images = list(images)
+    workers = workers or min(len(images), os.cpu_count() or 1)
+    if workers <= 1:
+        return [remove_red_stamp(img, precheck) for img in images]
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda img: remove_red_stamp(img, precheck), images))
+
+def clean_medical_element(img_path):
+    img = cv2.imread(img_path)
+    if img is None:
+        return
+
+    # File hanya ditulis ulang jika memang ada stempel merah yang dihapus
+    if remove_red_stamp(img):
+        cv2.imwrite(img_path, img)
@@ -0,0 +1,124 @@
+# Lokasi: core/retrieval.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Model yang sama dengan SemanticNormalizer (main_normalization.py), jadi tidak ada unduhan tambahan
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+CHUNK_CHARS = 600
+TOP_K = 6
+# Anggaran konteks per prompt (token, estimasi kasar ~4 karakter per token)
+TOKEN_BUDGET = 1000
+CHARS_PER_TOKEN = 4
+# Jumlah index dokumen yang disimpan di memori (satu per teks dokumen)
+MAX_INDEXES = 4
+CHUNK_SEPARATOR = "\n[...]\n"
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS):
+    """Potong dokumen per baris menjadi chunk <= chunk_chars (baris yang terlalu panjang dipecah)"""
+    chunks, current, size = [], [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line: continue
+        pieces = [line[i:i + chunk_chars] for i in range(0, len(line), chunk_chars)]
+        for piece in pieces:
+            if current and size + len(piece) + 1 > chunk_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+_model = None
+_model_error = None
+_model_lock = threading.Lock()
+
+def get_embedding_model():
+    """SentenceTransformer bersama (per proses), dimuat saat pertama dibutuhkan.
+
+    Kegagalan memuat model diingat selama proses berjalan: pemanggilan berikutnya
+    langsung raise RuntimeError tanpa mencoba memuat ulang (pemanggil kembali ke
+    potongan awal dokumen)."""
+    global _model, _model_error
+    with _model_lock:
+        if _model is None:
+            if _model_error is not None:
+                raise RuntimeError(f"Model embedding tidak tersedia: {_model_error}")
+            try:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME)
+            except Exception as e:
+                _model_error = f"{type(e).__name__}: {e}"
+                raise
+    return _model
+
+
+class DocumentIndex:
+    """Index vektor in-memory untuk satu dokumen: chunk di-embed sekali, lalu
+    setiap query (judul bab + kata kunci) mengambil chunk paling relevan."""
+
+    def __init__(self, text, model=None, chunk_chars=CHUNK_CHARS, batch_size=64):
+        import torch
+
+        self.chunks = chunk_text(text, chunk_chars)
+        self.model = model or get_embedding_model()
+        if self.chunks:
+            embeddings = self.model.encode(self.chunks, batch_size=batch_size, convert_to_tensor=True)
+            self.embeddings = torch.nn.functional.normalize(embeddings.float(), dim=1)
+        else:
+            self.embeddings = None
+
+    def rank(self, queries):
+        """Matriks skor cosine (query x chunk), satu kali encode untuk semua query"""
+        import torch
+
+        query_embs = self.model.encode(list(queries), convert_to_tensor=True)
+        query_embs = torch.nn.functional.normalize(query_embs.float(), dim=1)
+        return query_embs @ self.embeddings.to(query_embs.device).T
+
+    def pack(self, score_rows, k=TOP_K, token_budget=TOKEN_BUDGET):
+        """Gabungkan top-k chunk dari beberapa baris skor (bergiliran antar query) sampai
+        anggaran token habis; hasil disusun ulang sesuai urutan di dokumen."""
+        if self.embeddings is None: return ""
+        k = min(k, len(self.chunks))
+        rankings = [row.topk(k).indices.tolist() for row in score_rows]
+        chosen, used = [], 0
+        for position in range(k):
+            for ranking in rankings:
+                index = ranking[position]
+                if index in chosen: continue
+                cost = estimate_tokens(self.chunks[index])
+                if used + cost > token_budget: continue
+                chosen.append(index)
+                used += cost
+        return CHUNK_SEPARATOR.join(self.chunks[index] for index in sorted(chosen))
+
+    def select(self, queries, k=TOP_K, token_budget=TOKEN_BUDGET):
+        if self.embeddings is None: return ""
+        return self.pack(self.rank(queries), k, token_budget)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_document_index(text, model=None):
+    """Index per dokumen (kunci: hash teks), dipakai ulang selama masih di LRU kecil ini"""
+    key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = DocumentIndex(text, model)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,124 @@
+# Lokasi: core/sqlite_cache.py
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteCache:
+    """Dasar cache SQLite (OCR, jawaban LLM, piktogram): satu koneksi WAL dipakai
+    bersama dengan lock, statistik, dan LRU berdasarkan ukuran.
+
+    Subclass cukup menentukan tabel & skema kunci: TABLE, COLUMNS (definisi kolom
+    SQL, wajib berisi kolom SIZE_COLUMN, created, last_access), KEY_COLUMNS
+    (primary key, urutan sama dengan tuple kunci), INDEX dan STATS.
+    """
+
+    TABLE = None
+    COLUMNS = None
+    KEY_COLUMNS = ()
+    SIZE_COLUMN = "size"
+    INDEX = None
+    STATS = ("hits", "misses", "writes", "evicted")
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = dict.fromkeys(self.STATS, 0)
+        self._lock = threading.Lock()
+        self._key_where = " AND ".join(f"{column}=?" for column in self.KEY_COLUMNS)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} ({self.COLUMNS})")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.INDEX} ON {self.TABLE} (last_access)")
+
+    def count(self, stat, value=1):
+        with self._lock:
+            self.stats[stat] += value
+
+    def _touch(self, key, now=None):
+        """Perbarui last_access satu entri (dipanggil saat lock dipegang)"""
+        with self._conn:
+            self._conn.execute(f"UPDATE {self.TABLE} SET last_access=? WHERE {self._key_where}",
+                               (now or time.time(),) + tuple(key))
+
+    def _insert(self, row):
+        """INSERT OR REPLACE satu baris lengkap (urutan kolom tabel), lalu evict jika perlu"""
+        with self._lock, self._conn:
+            self._conn.execute(f"INSERT OR REPLACE INTO {self.TABLE} VALUES ({', '.join('?' * len(row))})", row)
+            self.stats["writes"] += 1
+            self._evict()
+
+    def _forget(self, key):
+        """Hook untuk subclass dengan salinan di memori: entri `key` baru saja dibuang dari SQLite"""
+
+    def _evict(self):
+        """LRU berdasarkan ukuran: buang entri paling lama tidak dipakai sampai total <= max_bytes"""
+        total = self._conn.execute(f"SELECT COALESCE(SUM({self.SIZE_COLUMN}), 0) FROM {self.TABLE}").fetchone()[0]
+        if total <= self.max_bytes: return
+        rows = self._conn.execute(
+            f"SELECT rowid, {self.SIZE_COLUMN}, {', '.join(self.KEY_COLUMNS)} FROM {self.TABLE} ORDER BY last_access"
+        ).fetchall()
+        victims = []
+        for rowid, size, *key in rows:
+            if total <= self.max_bytes: break
+            victims.append((rowid,))
+            self._forget(tuple(key))
+            total -= size
+        self._conn.executemany(f"DELETE FROM {self.TABLE} WHERE rowid=?", victims)
+        self.stats["evicted"] += len(victims)
+
+    def _delete(self, where=None, params=()):
+        """Hapus entri yang cocok dengan `where` (SQL), atau semuanya. Return jumlah entri."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"DELETE FROM {self.TABLE}" + (f" WHERE {where}" if where else ""), params)
+        return cursor.rowcount
+
+    def invalidate(self):
+        """Hapus seluruh cache. Return jumlah entri."""
+        return self._delete()
+
+    def summary(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({self.SIZE_COLUMN}), 0) FROM {self.TABLE}").fetchone()
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes, **stats,
+                "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0}
+
+
+def shared_cache(factory):
+    """Fungsi get_xxx_cache(): satu cache per proses, dibuat saat pertama kali dipakai"""
+    lock = threading.Lock()
+    instances = []
+
+    def get_cache():
+        with lock:
+            if not instances:
+                instances.append(factory())
+        return instances[0]
+    return get_cache
+
+
+def cache_parser(description, default_path):
+    """Parser CLI dasar cache: --path dan subcommand stats; subcommand lain ditambah lewat `sub`"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--path", default=default_path, help="Lokasi file cache SQLite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Tampilkan jumlah entri & ukuran cache")
+    return parser, sub
+
+def run_cli(parser, cache_class, commands):
+    """stats dicetak sebagai JSON; subcommand lain dijalankan lewat commands[nama](cache, args)"""
+    args = parser.parse_args()
+    cache = cache_class(args.path)
+    if args.command == "stats":
+        print(json.dumps(cache.summary(), indent=4))
+    else:
+        commands[args.command](cache, args)
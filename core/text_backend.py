@@ -0,0 +1,90 @@
+# Lokasi: core/text_backend.py
+# pdfplumber & fitz di-import saat backend dipakai, agar import modul ini tetap ringan
+
+
+class PdfplumberBackend:
+    """Ekstraksi teks per halaman dengan pdfplumber (akurat, tapi analisis layout murni Python)"""
+    name = "pdfplumber"
+
+    def iter_pages(self, pdf_path, with_fonts=False):
+        """Yield (page_num, page_text, lines) untuk setiap halaman, dari satu kali buka PDF.
+
+        Setiap line adalah dict dengan 'text', 'top', 'bottom' dan (jika
+        with_fonts=True) 'chars' berisi 'text', 'size', 'fontname'.
+        """
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages, 1):
+                # extract_text & extract_text_lines memakai textmap yang sama (di-cache pdfplumber)
+                text = page.extract_text()
+                lines = page.extract_text_lines(return_chars=with_fonts) if text else []
+                yield page_num, text, lines
+
+
+class PyMuPDFBackend:
+    """Ekstraksi teks per halaman dengan PyMuPDF (jauh lebih cepat dari pdfplumber)"""
+    name = "pymupdf"
+
+    # Toleransi vertikal (pt) untuk menggabungkan baris sejajar, sama dengan default y_tolerance pdfplumber
+    y_tolerance = 3
+
+    def iter_pages(self, pdf_path, with_fonts=False):
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as doc:
+            for page_num, page in enumerate(doc, 1):
+                lines = self._page_lines(page, with_fonts)
+                text = "\n".join(line["text"] for line in lines)
+                yield page_num, text, lines
+
+    def _page_lines(self, page, with_fonts):
+        import fitz
+
+        data = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT, sort=True)
+        raw_lines = []
+        for block in data["blocks"]:
+            for line in block.get("lines", []):
+                spans = [span for span in line["spans"] if span["text"]]
+                if not spans: continue
+                x0, top, _, bottom = line["bbox"]
+                raw_lines.append((top, bottom, x0, spans))
+
+        # PyMuPDF memecah kolom/sel yang sejajar menjadi baris terpisah; pdfplumber
+        # menggabungkannya menjadi satu baris. Gabungkan agar hasil kedua backend sebanding.
+        raw_lines.sort(key=lambda item: (item[0], item[2]))
+        rows = []
+        for top, bottom, x0, spans in raw_lines:
+            if rows and abs(top - rows[-1]["top"]) <= self.y_tolerance:
+                rows[-1]["parts"].append((x0, spans))
+                rows[-1]["bottom"] = max(rows[-1]["bottom"], bottom)
+            else:
+                rows.append({"top": top, "bottom": bottom, "parts": [(x0, spans)]})
+
+        lines = []
+        for row in rows:
+            parts = sorted(row["parts"], key=lambda part: part[0])
+            part_texts = ("".join(span["text"] for span in spans).strip() for _, spans in parts)
+            text = " ".join(part for part in part_texts if part)
+            if not text: continue
+            line = {"text": text, "top": row["top"], "bottom": row["bottom"]}
+            if with_fonts:
+                line["chars"] = [
+                    {"text": ch, "size": span["size"], "fontname": span["font"],
+                     "bold": bool(span["flags"] & fitz.TEXT_FONT_BOLD)}
+                    for _, spans in parts for span in spans for ch in span["text"]
+                ]
+            lines.append(line)
+        return lines
+
+
+TEXT_BACKENDS = {
+    PdfplumberBackend.name: PdfplumberBackend,
+    PyMuPDFBackend.name: PyMuPDFBackend,
+}
+
+def get_text_backend(name):
+    try:
+        return TEXT_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend teks tidak dikenal: {name} (pilihan: {', '.join(TEXT_BACKENDS)})")
@@ -3,12 +3,11 @@ import os
 from pathlib import Path
 from collections import Counter
 from tqdm import tqdm # Library untuk progress bar
+from core.keyword_matcher import KeywordMatcher
 
 def run_mass_discovery(input_folder, existing_schema):
-    # 1. Kumpulkan semua keyword yang sudah ada agar tidak dideteksi lagi
-    existing_keywords = []
-    for keywords in existing_schema.values():
-        existing_keywords.extend([kw.lower() for kw in keywords])
+    # 1. Kompilasi semua keyword yang sudah ada agar tidak dideteksi lagi
+    existing_matcher = KeywordMatcher(existing_schema)
 
     input_path = Path(input_folder)
     pdf_files = list(input_path.rglob("*.pdf"))
@@ -37,7 +36,7 @@ def run_mass_discovery(input_folder, existing_schema):
                         # - Bukan angka saja
                         # - Tidak ada di schema yang sudah ada
                         if 4 < len(clean) < 40 and not clean.isdigit():
-                            is_already_mapped = any(kw in clean.lower() for kw in existing_keywords)
+                            is_already_mapped = existing_matcher.has_keyword(clean)
                             
                             if not is_already_mapped:
                                 # Simpan sebagai calon keyword
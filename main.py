@@ -1,8 +1,11 @@
 import streamlit as st
 import os
 import json
+import uuid
 import google.generativeai as genai
 from core.extractor import PDFExtractor
+from core.ocr_pool import warm_up_ocr
+from core.llm import IncrementalJSON, gemini_stream
 from dotenv import load_dotenv
 
 # 1. Load API Key dari .env
@@ -12,9 +15,13 @@ api_key = os.getenv("GOOGLE_API_KEY")
 if api_key:
     genai.configure(api_key=api_key)
 
+# Muat engine OCR sekali per proses (di latar) agar tombol "Proses Halaman" tidak
+# menunggu model dimuat; rerun berikutnya memakai engine yang sama
+warm_up_ocr(lang='id', background=True)
+
 # --- FUNGSI AI GEMINI ---
-def normalize_with_gemini(text):
-    model = genai.GenerativeModel('gemini-1.5-flash')
+def normalize_with_gemini_stream(text, bypass_cache=False):
+    """Generator potongan jawaban Gemini (teks mentah, masih mungkin berisi ```json)"""
     prompt = f"""
     Tugas: Ubah teks OCR mentah dari manual book ini menjadi JSON yang rapi.
     Struktur JSON harus mencakup: 'judul_dokumen', 'spesifikasi_teknis', dan 'isi_materi'.
@@ -24,10 +31,8 @@ def normalize_with_gemini(text):
     TEKS OCR:
     {text}
     """
-    response = model.generate_content(prompt)
-    # Membersihkan tag markdown agar JSON bisa dibaca sistem
-    clean_json = response.text.replace("```json", "").replace("```", "").strip()
-    return clean_json
+    # Halaman yang sama dinormalisasi ulang -> jawaban diambil dari cache LLM (tanpa kuota Gemini)
+    return gemini_stream(prompt, 'gemini-1.5-flash', bypass=bypass_cache)
 
 st.set_page_config(page_title="PDF Normalizer Fix", layout="wide")
 st.title("📄 PDF Normalizer - Manual Book to JSON")
@@ -39,6 +44,10 @@ if not api_key:
 
 uploaded_file = st.file_uploader("Upload PDF Manual", type="pdf")
 
+# Kunci per sesi untuk file preview, agar dua pengguna di halaman yang sama tidak saling menimpa
+if 'session_key' not in st.session_state:
+    st.session_state['session_key'] = uuid.uuid4().hex
+
 if uploaded_file:
     # Simpan PDF sementara
     temp_pdf_path = os.path.join(os.getcwd(), "temp_uploaded.pdf")
@@ -53,7 +62,8 @@ if uploaded_file:
         if st.button("Proses Halaman"):
             with st.spinner("Sedang memproses OCR..."):
                 # Menjalankan fungsi dari extractor.py
-                raw_text, image_preview_path = extractor.process_single_page(page_idx)
+                raw_text, image_preview_path = extractor.process_single_page(
+                    page_idx, preview_key=st.session_state['session_key'])
                 
                 # Simpan hasil ke session state agar tidak hilang saat tombol lain ditekan
                 st.session_state['ocr_text_result'] = raw_text
@@ -76,13 +86,23 @@ if uploaded_file:
                 st.text_area("OCR Output:", st.session_state['ocr_text_result'], height=250)
                 
                 # TOMBOL NORMALISASI AI SEKARANG BERFUNGSI
+                bypass_cache = st.checkbox("Minta ulang ke AI (abaikan cache)", value=False)
                 if st.button("Langkah Final: Normalisasi ke JSON"):
                     with st.spinner("AI sedang merapikan data..."):
+                        # Jawaban ditampilkan selagi di-stream: field JSON terisi bertahap
+                        live = st.empty()
+                        parser = IncrementalJSON()
                         try:
-                            json_str = normalize_with_gemini(st.session_state['ocr_text_result'])
-                            st.session_state['final_json'] = json_str
+                            for chunk in normalize_with_gemini_stream(st.session_state['ocr_text_result'], bypass_cache):
+                                partial = parser.feed(chunk)
+                                if partial is not None:
+                                    live.json(partial)
+                                else:
+                                    live.code(parser.text, language="json")
+                            st.session_state['final_json'] = parser.text
                         except Exception as e:
                             st.error(f"Gagal memproses AI: {e}")
+                        live.empty()
 
                 # Menampilkan hasil JSON jika sudah selesai
                 if 'final_json' in st.session_state:
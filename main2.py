@@ -1,7 +1,7 @@
 # main.py
 import streamlit as st
 from core.extractor import PDFExtractor
-from core.ai_handler import AIHandler
+from core.ai_handler import AIHandler, CHAPTER_STRUCTURE
 from core.generator import PDFGenerator
 
 st.set_page_config(layout="wide", page_title="Alkes Standardizer")
@@ -27,6 +27,8 @@ if uploaded_file:
     with col_edit:
         st.subheader("📝 Draft Struktur Standar (Dapat Diedit)")
         
+        # OCR area gambar lebih lambat dan jarang dibutuhkan: hanya jika diminta
+        ocr_images = st.checkbox("OCR juga area gambar besar di halaman ber-text layer", value=False)
         if st.button("🚀 Ekstrak & Analisis dengan AI"):
             with st.spinner("AI sedang memetakan data..."):
                 # Simpan sementara untuk diekstrak
@@ -34,12 +36,40 @@ if uploaded_file:
                     f.write(uploaded_file.getbuffer())
                 
                 extractor = PDFExtractor("temp.pdf")
-                raw_text = ""
-                for page in extractor.doc:
-                    raw_text += page.get_text()
+                # Text layer dulu; hanya halaman tanpa text layer (scan) yang di-OCR, area gambar
+                # hanya jika dicentang (paralel, hasil per halaman sehingga progres bisa ditampilkan)
+                progress = st.progress(0.0)
+                pages = []
+                for page in extractor.iter_document(ocr_images=ocr_images):
+                    pages.append(page)
+                    progress.progress(len(pages) / len(extractor.doc))
+                pages.sort(key=lambda page: page["page"])
+                raw_text = "\n".join(page["text"] for page in pages if page["text"])
+                ocr_pages = sum(1 for page in pages if page["source"] != "text")
+                st.caption(f"{len(pages)} halaman, {ocr_pages} memakai OCR")
                 
-                # Panggil AI
-                st.session_state.data_draft = st.session_state.ai.map_content_to_chapters(raw_text)
+                # Panggil AI (streaming): setiap sub-bab tampil sebagian selama model masih menulis
+                live_area = st.empty()
+                live = {}
+                with live_area.container():
+                    for bab_name, sub_chapters in CHAPTER_STRUCTURE.items():
+                        st.markdown(f"**📁 {bab_name}**")
+                        for sub_name in sub_chapters:
+                            live[sub_name] = st.empty()
+
+                def show_partial(event):
+                    marker = "✅" if event["done"] else "⏳"
+                    live[event["title"]].markdown(f"{marker} **{event['title']}**\n\n{event['text']}")
+
+                st.session_state.data_draft = st.session_state.ai.map_content_to_chapters(
+                    raw_text, on_update=show_partial)
+                live_area.empty()
+                timings = st.session_state.ai.last_timings
+                if timings:
+                    slowest = max(timings, key=timings.get)
+                    first = min(st.session_state.ai.last_first_output.values(), default=0.0)
+                    st.caption(f"{len(timings)} sub-bab dipetakan, teks pertama {first:.1f} s, "
+                               f"terlama: {slowest} ({timings[slowest]:.1f} s)")
                 st.success("Analisis selesai!")
 
         # Form Tampilan Bab & Sub-bab
@@ -1,14 +1,24 @@
-import pdfplumber
+import argparse
+import difflib
+import hashlib
+import multiprocessing
 import json
+import logging
 import os
 import re
-import torch
+import statistics
+import time
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
-from langdetect import detect, DetectorFactory
+from core.keyword_matcher import KeywordMatcher
+from core.metrics import Metrics, configure_logging, get_logger, LOG_LEVELS
+from core.ocr_cache import file_sha256
+from core.text_backend import get_text_backend, TEXT_BACKENDS
 
-# Memastikan hasil deteksi bahasa konsisten
-DetectorFactory.seed = 0
+# Catatan: torch, sentence_transformers dan langdetect sengaja di-import di dalam
+# fungsi yang memakainya, agar CLI (mis. --help, cek manifest) tidak menunggu
+# beberapa detik hanya untuk import.
+
+log = get_logger("normalization")
 
 # ==========================================
 # 1. TRANSLATION MAP (Kamus Terjemahan Label)
@@ -39,10 +49,67 @@ TRANSLATION_MAP = {
 # ==========================================
 # 2. CLASS SEMANTIC NORMALIZER
 # ==========================================
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+SEMANTIC_THRESHOLD = 0.50
+HEADING_MAX_LEN = 60
+BOLD_FONT_MARKERS = ("bold", "black", "heavy", "semibold", "demibold")
+
+def is_bold_font(fontname):
+    """Deteksi font tebal dari nama font PDF (mis. 'ABCDEF+Arial-BoldMT')"""
+    name = (fontname or "").lower()
+    return any(marker in name for marker in BOLD_FONT_MARKERS)
+
+def page_line_features(text_lines):
+    """Fitur layout per baris (ukuran font relatif, tebal, jarak ke baris sebelumnya) dari backend teks"""
+    sizes = [c["size"] for line in text_lines for c in line["chars"] if c["text"].strip()]
+    body_size = statistics.median(sizes) if sizes else 0
+    heights = [line["bottom"] - line["top"] for line in text_lines]
+    line_height = statistics.median(heights) if heights else 0
+
+    features = []
+    prev_bottom = None
+    for line in text_lines:
+        chars = [c for c in line["chars"] if c["text"].strip()]
+        size = statistics.median(c["size"] for c in chars) if chars else 0
+        bold_chars = sum(1 for c in chars if c.get("bold") or is_bold_font(c.get("fontname")))
+        gap_above = line["top"] - prev_bottom if prev_bottom is not None else None
+
+        features.append({
+            "size_ratio": size / body_size if body_size else 1.0,
+            "bold": bool(chars) and bold_chars / len(chars) >= 0.5,
+            # Baris pertama di halaman atau ada spasi kosong di atasnya
+            "isolated": gap_above is None or gap_above > line_height * 0.5,
+        })
+        prev_bottom = line["bottom"]
+    return features
+
+def detect_language_from_text(sample_text):
+    """Deteksi bahasa dari teks sampel (2 halaman pertama)"""
+    from langdetect import detect, DetectorFactory
+
+    # Memastikan hasil deteksi bahasa konsisten
+    DetectorFactory.seed = 0
+    try:
+        lang = detect(sample_text)
+        return "Indonesia" if lang == 'id' else "English"
+    except:
+        return "English"
+
+def is_heading_candidate(clean_block, process_text, features):
+    """Aturan layout kandidat judul: font lebih besar, tebal, bernomor, atau terpisah dari baris lain"""
+    return (
+        features["size_ratio"] >= 1.15
+        or features["bold"]
+        or process_text != clean_block  # Diawali nomor bab (romawi/angka)
+        or features["isolated"]
+    )
+
 class SemanticNormalizer:
-    def __init__(self, schema_labels):
-        print("Memuat model AI Multilingual...")
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+    def __init__(self, schema_labels, batch_size=64, layout_filter=False, backend="pdfplumber", trace=False):
+        from sentence_transformers import SentenceTransformer
+
+        log.info("Memuat model AI Multilingual...")
+        self.model = SentenceTransformer(MODEL_NAME)
         self.labels = schema_labels
         self.label_keys = list(schema_labels.keys())
         
@@ -53,22 +120,132 @@ class SemanticNormalizer:
             rich_descriptions.append(combined_text)
             
         self.label_embeddings = self.model.encode(rich_descriptions, convert_to_tensor=True)
-        self.threshold = 0.50 
+        self.threshold = SEMANTIC_THRESHOLD
+        self.batch_size = batch_size
+        # Backend ekstraksi teks: "pdfplumber" (default) atau "pymupdf"
+        self.backend = get_text_backend(backend)
+        # layout_filter=True: hanya kandidat judul (fitur layout) yang dikirim ke model
+        self.layout_filter = layout_filter
+        self.last_filter_stats = {}
+        self.last_model_lines = 0
+
+        # Keyword & exclude dikompilasi sekali menjadi satu matcher Aho-Corasick
+        self.matcher = KeywordMatcher(schema_labels)
+        # Counter & timer hot path (baris, kecocokan, panggilan model, latensi halaman/dokumen)
+        self.metrics = Metrics(trace=trace)
 
     def detect_language(self, pdf_path):
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                sample_text = ""
-                for page in pdf.pages[:2]:
-                    extracted = page.extract_text()
-                    if extracted: sample_text += extracted + " "
-                lang = detect(sample_text)
-                return "Indonesia" if lang == 'id' else "English"
+            sample_text = ""
+            for page_num, text, _ in self.backend.iter_pages(pdf_path):
+                if page_num > 2: break
+                if text: sample_text += text + " "
+            return self.detect_language_from_text(sample_text)
         except:
             return "English"
 
-    def process_pdf(self, pdf_path):
-        lang_detected = self.detect_language(pdf_path)
+    def detect_language_from_text(self, sample_text):
+        return detect_language_from_text(sample_text)
+
+    def preprocess_line(self, clean_block):
+        """Hapus angka romawi/bab dari input AI"""
+        process_text = re.sub(r'^\b[IVXLCDM]+\b\.?\s*', '', clean_block, flags=re.IGNORECASE)
+        process_text = re.sub(r'^\d+(\.\d+)*\s*', '', process_text).strip()
+        return process_text if process_text else clean_block
+
+    def classify_lines(self, lines, semantic_mask=None):
+        """Klasifikasi banyak baris sekaligus: hard match per baris, semantic match dalam satu batch.
+
+        `lines` adalah list tuple (clean_block, process_text). Mengembalikan list
+        tuple (matched_internal_key, best_score) dengan urutan yang sama.
+        `semantic_mask` (opsional) menandai baris mana yang boleh dikirim ke model.
+        """
+        results = [(None, 0)] * len(lines)
+        semantic_indices = []
+        exclude_masks = []
+        self.last_model_lines = 0
+
+        # A. Logika 1: Hard Match (Mengecek Keywords manual, satu scan per baris)
+        for i, (clean_block, _) in enumerate(lines):
+            keyword_mask, exclude_mask = self.matcher.scan(clean_block)
+            if keyword_mask:
+                results[i] = (self.matcher.first_label(keyword_mask), 0.95)
+                self.metrics.incr("hard_matches")
+            elif semantic_mask is None or semantic_mask[i]:
+                semantic_indices.append(i)
+                exclude_masks.append(exclude_mask)
+
+        if not semantic_indices:
+            return results
+
+        import torch
+        from sentence_transformers import util
+
+        # B. Logika 2: Semantic Match (Satu kali encode untuk semua baris sisa)
+        texts = [lines[i][1] for i in semantic_indices]
+        self.last_model_lines = len(texts)
+        self.metrics.incr("model_calls")
+        self.metrics.incr("model_lines", len(texts))
+        with self.metrics.timer("model_encode", lines=len(texts)):
+            block_embs = self.model.encode(texts, batch_size=self.batch_size, convert_to_tensor=True)
+            scores = util.cos_sim(block_embs, self.label_embeddings)
+
+        # C. Exclude List sebagai mask boolean (baris x label)
+        exclude_mask = torch.tensor(
+            [self.matcher.mask_to_flags(mask) for mask in exclude_masks],
+            dtype=torch.bool, device=scores.device
+        ).reshape(scores.shape)
+
+        masked_scores = scores.masked_fill(exclude_mask, float('-inf'))
+        best_scores, best_indices = masked_scores.max(dim=1)
+
+        for row, i in enumerate(semantic_indices):
+            # Semua label ter-exclude -> tidak ada kecocokan
+            if exclude_mask[row].all(): continue
+            results[i] = (self.label_keys[best_indices[row].item()], best_scores[row].item())
+            if results[i][1] > self.threshold:
+                self.metrics.incr("semantic_matches")
+
+        return results
+
+    def process_pdf(self, pdf_path, section_sink=None):
+        """Normalisasi satu PDF.
+
+        Jika `section_sink` diberikan, setiap section dikirim sebagai record
+        (dengan rentang halaman) ke callable tersebut begitu selesai, dan
+        teks konten tidak disimpan di memori (output["content"] kosong).
+        """
+        with self.metrics.timer("document", file=pdf_path.name):
+            return self._process_pdf(pdf_path, section_sink)
+
+    def _process_pdf(self, pdf_path, section_sink):
+        metrics = self.metrics
+        # 1. Satu kali buka PDF: kumpulkan semua baris + status kandidat judul,
+        #    sekaligus teks 2 halaman pertama untuk deteksi bahasa
+        records = []
+        sample_text = ""
+        pages = self.backend.iter_pages(pdf_path, with_fonts=self.layout_filter)
+        for page_num, text, text_lines in metrics.timed_iter(pages, "page_extract", file=pdf_path.name):
+            metrics.incr("pages")
+            if page_num <= 2 and text: sample_text += text + " "
+            if not text_lines: continue
+            features = page_line_features(text_lines) if self.layout_filter else [None] * len(text_lines)
+
+            for line, feat in zip(text_lines, features):
+                clean_block = line["text"].strip()
+                if len(clean_block) < 5: continue 
+                process_text = self.preprocess_line(clean_block)
+                # Baris >= 60 karakter tidak mungkin jadi judul, jadi tidak perlu diklasifikasi
+                if len(clean_block) >= HEADING_MAX_LEN:
+                    status = "long"
+                elif feat is not None and not is_heading_candidate(clean_block, process_text, feat):
+                    status = "body"
+                else:
+                    status = "candidate"
+                records.append((page_num, clean_block, process_text, status))
+
+        with metrics.timer("language_detection"):
+            lang_detected = self.detect_language_from_text(sample_text)
         lang_code = "ID" if lang_detected == "Indonesia" else "EN"
 
         output_data = {
@@ -76,80 +253,110 @@ class SemanticNormalizer:
             "content": {},
             "detected_headings": {} # Tracking sub-bab asli untuk summary
         }
-        
+
+        # 2. Klasifikasi baris pendek dalam satu batch; hanya kandidat judul yang dikirim ke model
+        short_indices = [i for i, record in enumerate(records) if record[3] != "long"]
+        short_matches = self.classify_lines(
+            [(records[i][1], records[i][2]) for i in short_indices],
+            semantic_mask=[records[i][3] == "candidate" for i in short_indices],
+        )
+        matches = [(None, 0)] * len(records)
+        for i, match in zip(short_indices, short_matches):
+            matches[i] = match
+
+        self.last_filter_stats = {
+            "lines_total": len(records),
+            "lines_filtered_length": sum(1 for record in records if record[3] == "long"),
+            "lines_filtered_layout": sum(1 for record in records if record[3] == "body"),
+            "lines_to_model": self.last_model_lines,
+        }
+        metrics.incr("documents")
+        metrics.incr("lines_seen", self.last_filter_stats["lines_total"])
+        metrics.incr("lines_filtered_length", self.last_filter_stats["lines_filtered_length"])
+        metrics.incr("lines_filtered_layout", self.last_filter_stats["lines_filtered_layout"])
+
+        # Konten per section disimpan sebagai list potongan lalu di-join sekali di akhir;
+        # judul per label disimpan sebagai dict (set yang menjaga urutan sisip)
+        sections = {}
+        headings = {}
+        section_run = None  # Section yang sedang berjalan (mode streaming)
+
+        audit = log.isEnabledFor(logging.DEBUG)
         current_section_internal = None
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text()
-                if not text: continue
+        for (page_num, clean_block, _, _), (matched_internal_key, best_score) in zip(records, matches):
+            # D. Update Section & Audit Record
+            if len(clean_block) < HEADING_MAX_LEN and best_score > self.threshold:
+                current_section_internal = matched_internal_key
                 
-                blocks = text.split('\n')
-                for block in blocks:
-                    clean_block = block.strip()
-                    if len(clean_block) < 5: continue 
-
-                    # A. Pre-processing (Hapus angka romawi/bab dari input AI)
-                    process_text = re.sub(r'^\b[IVXLCDM]+\b\.?\s*', '', clean_block, flags=re.IGNORECASE)
-                    process_text = re.sub(r'^\d+(\.\d+)*\s*', '', process_text).strip()
-                    if not process_text: process_text = clean_block
-
-                    matched_internal_key = None
-                    best_score = 0
-
-                    # B. Logika 1: Hard Match (Mengecek Keywords manual)
-                    for key, val in self.labels.items():
-                        if any(kw.lower() in clean_block.lower() for kw in val["keywords"]):
-                            matched_internal_key = key
-                            best_score = 0.95 
-                            break
-
-                    # C. Logika 2: Semantic Match (Jika Hard Match tidak kena)
-                    if not matched_internal_key:
-                        block_emb = self.model.encode(process_text, convert_to_tensor=True)
-                        scores = util.cos_sim(block_emb, self.label_embeddings)[0]
-                        top_indices = torch.argsort(scores, descending=True)
-
-                        for idx in top_indices:
-                            idx = idx.item()
-                            temp_key = self.label_keys[idx]
-                            temp_score = scores[idx].item()
-                            
-                            # Cek Exclude List
-                            excludes = self.labels[temp_key].get("exclude", [])
-                            if not any(ex.lower() in clean_block.lower() for ex in excludes):
-                                matched_internal_key = temp_key
-                                best_score = temp_score
-                                break
-
-                    # D. Update Section & Audit Record
-                    if len(clean_block) < 60 and best_score > self.threshold:
-                        current_section_internal = matched_internal_key
-                        
-                        # Simpan asal sub-bab untuk master summary
-                        if matched_internal_key not in output_data["detected_headings"]:
-                            output_data["detected_headings"][matched_internal_key] = []
-                        
-                        heading_info = f"{clean_block} (Hal. {page_num})"
-                        if heading_info not in output_data["detected_headings"][matched_internal_key]:
-                            output_data["detected_headings"][matched_internal_key].append(heading_info)
-
-                        # Output Terminal
-                        translated = TRANSLATION_MAP.get(matched_internal_key, {}).get(lang_code, matched_internal_key)
-                        print(f"[AUDIT] Halaman {page_num}:")
-                        print(f"   Judul di PDF   : '{clean_block}'")
-                        print(f"   Masuk ke Schema: '{translated}'")
-                        print(f"   Tingkat Cocok  : {best_score:.2f}\n")
-
-                    # E. Simpan Konten Teks
-                    if current_section_internal:
-                        final_key = TRANSLATION_MAP.get(current_section_internal, {}).get(lang_code, current_section_internal)
-                        if final_key not in output_data["content"]:
-                            output_data["content"][final_key] = ""
-                        output_data["content"][final_key] += clean_block + " "
+                # Simpan asal sub-bab untuk master summary
+                headings.setdefault(matched_internal_key, {})[f"{clean_block} (Hal. {page_num})"] = None
+                metrics.incr("headings_matched")
+
+                # Detail audit hanya di level DEBUG (--log-level DEBUG)
+                if audit:
+                    translated = TRANSLATION_MAP.get(matched_internal_key, {}).get(lang_code, matched_internal_key)
+                    log.debug(f"[AUDIT] Halaman {page_num}:\n"
+                              f"   Judul di PDF   : '{clean_block}'\n"
+                              f"   Masuk ke Schema: '{translated}'\n"
+                              f"   Tingkat Cocok  : {best_score:.2f}\n")
+
+            # E. Simpan Konten Teks
+            if current_section_internal:
+                final_key = TRANSLATION_MAP.get(current_section_internal, {}).get(lang_code, current_section_internal)
+                if section_sink is None:
+                    sections.setdefault(final_key, []).append(clean_block)
+                    continue
+
+                # Mode streaming: satu record per rangkaian section, dikirim begitu section berganti
+                if section_run is None or section_run["section"] != final_key:
+                    self._emit_section(section_sink, section_run)
+                    section_run = {
+                        "file": pdf_path.name, "language": lang_detected,
+                        "section": final_key, "schema_key": current_section_internal, "heading": clean_block,
+                        "page_start": page_num, "page_end": page_num, "chunks": [],
+                    }
+                section_run["page_end"] = page_num
+                section_run["chunks"].append(clean_block)
 
+        self._emit_section(section_sink, section_run)
+
+        output_data["content"] = {key: " ".join(chunks) + " " for key, chunks in sections.items()}
+        output_data["detected_headings"] = {key: list(items) for key, items in headings.items()}
         return output_data
 
+    def _emit_section(self, section_sink, section_run):
+        if section_sink is None or section_run is None: return
+        record = dict(section_run)
+        record["text"] = " ".join(record.pop("chunks"))
+        section_sink(record)
+
+    def compare_heading_filter(self, pdf_path):
+        """Bandingkan judul yang terdeteksi dengan & tanpa layout filter"""
+        original_mode = self.layout_filter
+        try:
+            self.layout_filter = False
+            baseline = self.process_pdf(pdf_path)
+            baseline_stats = self.last_filter_stats
+            self.layout_filter = True
+            filtered = self.process_pdf(pdf_path)
+            filtered_stats = self.last_filter_stats
+        finally:
+            self.layout_filter = original_mode
+
+        baseline_headings = {(k, h) for k, hs in baseline["detected_headings"].items() for h in hs}
+        filtered_headings = {(k, h) for k, hs in filtered["detected_headings"].items() for h in hs}
+        return {
+            "file": pdf_path.name,
+            "lines_total": baseline_stats["lines_total"],
+            "lines_filtered_layout": filtered_stats["lines_filtered_layout"],
+            "lines_to_model_baseline": baseline_stats["lines_to_model"],
+            "lines_to_model_layout": filtered_stats["lines_to_model"],
+            "headings_baseline": len(baseline_headings),
+            "headings_recovered": len(baseline_headings & filtered_headings),
+            "headings_missed": [f"{k}: {h}" for k, h in sorted(baseline_headings - filtered_headings)],
+            "headings_extra": [f"{k}: {h}" for k, h in sorted(filtered_headings - baseline_headings)],
+        }
+
 # ==========================================
 # 3. SCHEMA LABELS
 # ==========================================
@@ -239,44 +446,285 @@ MY_SCHEMA_LABELS = {
 # ==========================================
 # 4. RUNNER
 # ==========================================
-def run_process_limited(input_dir, output_dir, limit=10):
-    normalizer = SemanticNormalizer(MY_SCHEMA_LABELS)
+MANIFEST_NAME = "normalization_manifest.json"
+METRICS_NAME = "run_metrics.json"
+TRACE_NAME = "run_trace.json"
+MANIFEST_VERSION = 1
+
+def build_config(layout_filter, backend, output_format):
+    """Semua hal yang memengaruhi isi file output (selain isi PDF)"""
+    schema_blob = json.dumps({"labels": MY_SCHEMA_LABELS, "translation": TRANSLATION_MAP}, sort_keys=True, ensure_ascii=False)
+    return {
+        "schema_hash": hashlib.sha256(schema_blob.encode('utf-8')).hexdigest(),
+        "model": MODEL_NAME,
+        "threshold": SEMANTIC_THRESHOLD,
+        "layout_filter": layout_filter,
+        "backend": backend,
+        "output_format": output_format,
+    }
+
+def load_manifest(manifest_file):
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(manifest, manifest_file):
+    # Tulis ke file sementara dulu agar manifest tidak korup jika proses terhenti
+    tmp_file = manifest_file.with_suffix(".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, manifest_file)
+
+def is_up_to_date(entry, pdf_hash, config, out_file):
+    if not entry or not out_file.exists(): return False
+    if entry.get("pdf_sha256") != pdf_hash: return False
+    return all(entry.get(key) == value for key, value in config.items())
+
+def normalize_to_file(normalizer, pdf, out_file, output_format="json"):
+    """Proses satu PDF dan tulis hasilnya (JSON utuh, atau JSONL per section secara streaming)"""
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    if output_format == "jsonl":
+        with open(out_file, 'w', encoding='utf-8') as f:
+            write_record = lambda record: f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return normalizer.process_pdf(pdf, section_sink=write_record)
+
+    result = normalizer.process_pdf(pdf)
+    with open(out_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=4, ensure_ascii=False)
+    return result
+
+_worker_normalizer = None
+
+def _init_worker(batch_size, layout_filter, backend, torch_threads, log_level, trace):
+    """Inisialisasi worker: model dimuat sekali per proses"""
+    global _worker_normalizer
+    configure_logging(log_level)
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+    _worker_normalizer = SemanticNormalizer(MY_SCHEMA_LABELS, batch_size=batch_size, layout_filter=layout_filter,
+                                            backend=backend, trace=trace)
+    # Waktu muat model tidak ikut dikirim sebagai metrics dokumen pertama
+    _worker_normalizer.metrics.drain()
+
+def _process_in_worker(task):
+    idx, pdf, out_file, output_format = task
+    result = normalize_to_file(_worker_normalizer, pdf, out_file, output_format)
+    return idx, result["detected_headings"], _worker_normalizer.last_filter_stats, _worker_normalizer.metrics.drain()
+
+def run_process_limited(input_dir, output_dir, limit=10, batch_size=64, layout_filter=False,
+                        workers=1, torch_threads=None, force=False, backend="pdfplumber", output_format="json",
+                        trace=False):
+    run_start = time.perf_counter()
+    run_metrics = Metrics(trace=trace)
+    documents = []
     input_path = Path(input_dir)
-    pdf_files = list(input_path.rglob("*.pdf"))
-    
-    # Inisialisasi Master Summary
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    pdf_files = list(input_path.rglob("*.pdf"))[:limit]
+    total = len(pdf_files)
+
+    # Manifest: hash PDF + konfigurasi per file output, untuk melewati file yang belum berubah
+    manifest_file = output_path / MANIFEST_NAME
+    manifest = load_manifest(manifest_file)
+    config = build_config(layout_filter, backend, output_format)
+    out_keys = [pdf.relative_to(input_path).with_suffix("." + output_format).as_posix() for pdf in pdf_files]
+    pdf_hashes = [file_sha256(pdf) for pdf in pdf_files]
+
+    tasks = []
+    for idx, pdf in enumerate(pdf_files):
+        entry = manifest["files"].get(out_keys[idx])
+        if not force and is_up_to_date(entry, pdf_hashes[idx], config, output_path / out_keys[idx]):
+            continue
+        tasks.append((idx, pdf, output_path / out_keys[idx], output_format))
+    log.info(f"[INFO] {total - len(tasks)}/{total} PDF sudah up-to-date, {len(tasks)} akan diproses")
+    run_metrics.incr("documents_skipped", total - len(tasks))
+
+    def handle_result(idx, detected_headings, stats, doc_metrics):
+        pdf = pdf_files[idx]
+        log.info(f"\n[{idx + 1}/{total}] Selesai: {pdf.name}")
+        log.info(f"[FILTER] {stats['lines_to_model']}/{stats['lines_total']} baris ke model "
+                 f"(difilter: {stats['lines_filtered_length']} panjang, {stats['lines_filtered_layout']} layout)")
+        run_metrics.merge(doc_metrics)
+        documents.append({
+            "file": pdf.relative_to(input_path).as_posix(),
+            "seconds": round(doc_metrics["timers"]["document"]["total_seconds"], 4),
+            "pages": doc_metrics["counters"].get("pages", 0),
+            **stats,
+        })
+
+        manifest["files"][out_keys[idx]] = {
+            "source": pdf.relative_to(input_path).as_posix(),
+            "pdf_sha256": pdf_hashes[idx],
+            **config,
+            "detected_headings": detected_headings,
+        }
+        save_manifest(manifest, manifest_file)
+
+    if tasks and workers <= 1:
+        if torch_threads:
+            import torch
+            torch.set_num_threads(torch_threads)
+        with run_metrics.timer("model_load"):
+            normalizer = SemanticNormalizer(MY_SCHEMA_LABELS, batch_size=batch_size, layout_filter=layout_filter,
+                                            backend=backend, trace=trace)
+        normalizer.metrics.drain()
+        for idx, pdf, out_file, _ in tasks:
+            log.info(f"\n[{idx + 1}/{total}] Memproses: {pdf.name}")
+            result = normalize_to_file(normalizer, pdf, out_file, output_format)
+            handle_result(idx, result["detected_headings"], normalizer.last_filter_stats, normalizer.metrics.drain())
+    elif tasks:
+        # Default: bagi rata core CPU ke setiap worker
+        if not torch_threads:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        log.info(f"[INFO] {workers} worker x {torch_threads} thread torch untuk {len(tasks)} PDF")
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, initializer=_init_worker,
+                      initargs=(batch_size, layout_filter, backend, torch_threads,
+                                logging.getLevelName(log.getEffectiveLevel()), trace)) as pool:
+            # imap_unordered + chunksize=1: worker mengambil PDF berikutnya dari antrian bersama
+            for idx, detected_headings, stats, doc_metrics in pool.imap_unordered(_process_in_worker, tasks, chunksize=1):
+                handle_result(idx, detected_headings, stats, doc_metrics)
+
+    # Masukkan hasil deteksi ke Master Summary (dari manifest, urutan tetap sesuai daftar PDF)
     master_summary = {key: {} for key in MY_SCHEMA_LABELS.keys()}
-    
-    count = 0 
-    for pdf in pdf_files:
-        if count >= limit: break
-            
-        print(f"\n[{count + 1}/{limit}] Memproses: {pdf.name}")
-        result = normalizer.process_pdf(pdf)
-        
-        # Masukkan hasil deteksi ke Master Summary
-        for schema_key, headings in result.get("detected_headings", {}).items():
+    for pdf, out_key in zip(pdf_files, out_keys):
+        for schema_key, headings in manifest["files"][out_key]["detected_headings"].items():
             master_summary[schema_key][pdf.name] = headings
-        
-        # Simpan JSON individual
-        rel_path = pdf.relative_to(input_path)
-        out_file = Path(output_dir) / rel_path.with_suffix(".json")
-        out_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(out_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=4, ensure_ascii=False)
-        
-        count += 1
 
     # SIMPAN MASTER AUDIT SUMMARY (Rangkuman Semua PDF)
-    summary_file = Path(output_dir) / "master_audit_summary.json"
+    summary_file = output_path / "master_audit_summary.json"
     with open(summary_file, 'w', encoding='utf-8') as f:
         json.dump(master_summary, f, indent=4, ensure_ascii=False)
-    
-    print(f"\n[DONE] Proses selesai.")
-    print(f"[INFO] Master summary disimpan di: {summary_file}")
+
+    # Metrics per run (dan trace opsional) di samping master summary
+    run_metrics.write_json(
+        output_path / METRICS_NAME,
+        config={**config, "workers": workers, "batch_size": batch_size},
+        wall_seconds=round(time.perf_counter() - run_start, 4),
+        documents=sorted(documents, key=lambda item: item["file"]),
+    )
+    if trace:
+        run_metrics.write_trace(output_path / TRACE_NAME)
+
+    log.info(f"\n[DONE] Proses selesai.")
+    log.info(f"[INFO] Master summary disimpan di: {summary_file}")
+    log.info(f"[INFO] Metrics run disimpan di: {output_path / METRICS_NAME}")
+
+def run_heading_filter_report(input_dir, output_file, limit=10, batch_size=64):
+    """Laporan efek layout filter: baris yang difilter & judul yang tetap ditemukan"""
+    normalizer = SemanticNormalizer(MY_SCHEMA_LABELS, batch_size=batch_size)
+    pdf_files = list(Path(input_dir).rglob("*.pdf"))[:limit]
+
+    files = []
+    for idx, pdf in enumerate(pdf_files, 1):
+        log.info(f"\n[{idx}/{len(pdf_files)}] Membandingkan: {pdf.name}")
+        files.append(normalizer.compare_heading_filter(pdf))
+
+    totals = {key: sum(item[key] for item in files) for key in (
+        "lines_total", "lines_filtered_layout", "lines_to_model_baseline",
+        "lines_to_model_layout", "headings_baseline", "headings_recovered",
+    )}
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"totals": totals, "files": files}, f, indent=4, ensure_ascii=False)
+
+    log.info(f"\n[INFO] Baris ke model: {totals['lines_to_model_baseline']} -> {totals['lines_to_model_layout']}")
+    log.info(f"[INFO] Judul ditemukan kembali: {totals['headings_recovered']}/{totals['headings_baseline']}")
+    log.info(f"[INFO] Laporan disimpan di: {output_file}")
+
+def content_similarity(text_a, text_b):
+    """Kemiripan dua teks berbasis kata (0-1)"""
+    words_a, words_b = text_a.split(), text_b.split()
+    if not words_a and not words_b: return 1.0
+    return difflib.SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+def run_backend_comparison(input_dir, output_file, limit=10, batch_size=64, backends=("pdfplumber", "pymupdf")):
+    """Laporan perbandingan backend teks: throughput & perbedaan JSON output"""
+    normalizer = SemanticNormalizer(MY_SCHEMA_LABELS, batch_size=batch_size)
+    pdf_files = list(Path(input_dir).rglob("*.pdf"))[:limit]
+    base_name = backends[0]
+
+    throughput = {name: {"pages": 0, "extract_seconds": 0.0, "process_seconds": 0.0} for name in backends}
+    files = []
+    for idx, pdf in enumerate(pdf_files, 1):
+        log.info(f"\n[{idx}/{len(pdf_files)}] Membandingkan backend: {pdf.name}")
+        results = {}
+        for name in backends:
+            normalizer.backend = get_text_backend(name)
+
+            start = time.perf_counter()
+            pages = sum(1 for _ in normalizer.backend.iter_pages(pdf))
+            throughput[name]["extract_seconds"] += time.perf_counter() - start
+            throughput[name]["pages"] += pages
+
+            start = time.perf_counter()
+            results[name] = normalizer.process_pdf(pdf)
+            throughput[name]["process_seconds"] += time.perf_counter() - start
+
+        base = results[base_name]
+        item = {"file": pdf.name, "backends": {}}
+        for name in backends[1:]:
+            other = results[name]
+            sections = set(base["content"]) | set(other["content"])
+            base_headings = {(k, h) for k, hs in base["detected_headings"].items() for h in hs}
+            other_headings = {(k, h) for k, hs in other["detected_headings"].items() for h in hs}
+            item["backends"][name] = {
+                "identical": json.dumps(base, ensure_ascii=False) == json.dumps(other, ensure_ascii=False),
+                "language_match": base["metadata"]["detected_language"] == other["metadata"]["detected_language"],
+                "sections_only_in_" + base_name: sorted(set(base["content"]) - set(other["content"])),
+                "sections_only_in_" + name: sorted(set(other["content"]) - set(base["content"])),
+                "section_similarity": {
+                    key: round(content_similarity(base["content"].get(key, ""), other["content"].get(key, "")), 3)
+                    for key in sorted(sections)
+                },
+                "headings_common": len(base_headings & other_headings),
+                "headings_only_in_" + base_name: len(base_headings - other_headings),
+                "headings_only_in_" + name: len(other_headings - base_headings),
+            }
+        files.append(item)
+
+    for name, stats in throughput.items():
+        stats["extract_pages_per_second"] = round(stats["pages"] / stats["extract_seconds"], 2) if stats["extract_seconds"] else None
+        stats["process_pages_per_second"] = round(stats["pages"] / stats["process_seconds"], 2) if stats["process_seconds"] else None
+        log.info(f"[INFO] {name}: ekstraksi {stats['extract_pages_per_second']} hal/detik, "
+              f"normalisasi penuh {stats['process_pages_per_second']} hal/detik")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"throughput": throughput, "files": files}, f, indent=4, ensure_ascii=False)
+    log.info(f"[INFO] Laporan disimpan di: {output_file}")
 
 if __name__ == "__main__":
-    if not os.path.exists("data_input"):
-        os.makedirs("data_input")
-    run_process_limited("data_input", "data_output", limit=10)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Normalisasi semantik manual book PDF ke JSON")
+    parser.add_argument("--input", default="data_input", help="Folder PDF sumber")
+    parser.add_argument("--output", default="data_output", help="Folder hasil JSON")
+    parser.add_argument("--limit", type=int, default=10, help="Jumlah maksimum PDF yang diproses")
+    parser.add_argument("--workers", type=int, default=1, help="Jumlah proses worker paralel")
+    parser.add_argument("--threads", type=int, default=None, help="Thread intra-op torch per worker")
+    parser.add_argument("--batch-size", type=int, default=64, help="Ukuran batch encode model")
+    parser.add_argument("--backend", default="pdfplumber", choices=list(TEXT_BACKENDS), help="Backend ekstraksi teks")
+    parser.add_argument("--format", default="json", choices=["json", "jsonl"],
+                        help="json: satu dokumen per file; jsonl: satu record per section, ditulis streaming")
+    parser.add_argument("--layout-filter", action="store_true", help="Hanya kandidat judul (layout) yang dikirim ke model")
+    parser.add_argument("--force", action="store_true", help="Proses ulang semua PDF walaupun manifest menyatakan up-to-date")
+    parser.add_argument("--heading-report", metavar="FILE", help="Buat laporan perbandingan layout filter, bukan normalisasi")
+    parser.add_argument("--backend-report", metavar="FILE", help="Buat laporan perbandingan backend teks, bukan normalisasi")
+    parser.add_argument("--log-level", default="INFO", choices=LOG_LEVELS, help="DEBUG menampilkan detail [AUDIT] per judul")
+    parser.add_argument("--trace", action="store_true", help=f"Simpan span per halaman/dokumen ke {TRACE_NAME} (format Chrome Trace)")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    if not os.path.exists(args.input):
+        os.makedirs(args.input)
+    if args.heading_report:
+        run_heading_filter_report(args.input, args.heading_report, limit=args.limit, batch_size=args.batch_size)
+    elif args.backend_report:
+        run_backend_comparison(args.input, args.backend_report, limit=args.limit, batch_size=args.batch_size)
+    else:
+        run_process_limited(args.input, args.output, limit=args.limit, batch_size=args.batch_size,
+                            layout_filter=args.layout_filter, workers=args.workers, torch_threads=args.threads,
+                            force=args.force, backend=args.backend, output_format=args.format, trace=args.trace)
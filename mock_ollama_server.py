@@ -0,0 +1,159 @@
+"""Server tiruan Ollama (/api/generate) untuk mencoba AIHandler tanpa model asli.
+
+Jawaban deterministik: prompt satu judul -> "Isi <judul>", prompt dengan
+format JSON -> {"<judul>": "Isi <judul>"} untuk setiap judul di daftar.
+Seperti Ollama, "stream" default true: jawaban dikirim per token sebagai NDJSON
+(chunked), dengan latensi buatan dibagi rata ke setiap token.
+
+    python mock_ollama_server.py --port 11434 --delay 0.5
+    OLLAMA_URL=http://127.0.0.1:11434/api/generate streamlit run main2.py
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TITLE_LIST_PATTERN = re.compile(r'^\s*- "(.+)"\s*$', re.MULTILINE)
+SINGLE_TITLE_PATTERN = re.compile(r'informasi untuk "(.+?)"')
+TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+
+class MockState:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def summary(self):
+        with self.lock:
+            return {"requests": self.requests, "active": self.active, "max_active": self.max_active}
+
+
+def mock_answer(prompt, fmt=None):
+    if fmt == "json":
+        return json.dumps({title: f"Isi {title}" for title in TITLE_LIST_PATTERN.findall(prompt)},
+                          ensure_ascii=False)
+    match = SINGLE_TITLE_PATTERN.search(prompt)
+    return f"Isi {match.group(1)}" if match else "KOSONG"
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 agar koneksi keep-alive dari requests.Session bisa dipakai ulang
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.state.summary())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        state = self.server.state
+        state.enter()
+        try:
+            answer = mock_answer(payload.get("prompt", ""), payload.get("format"))
+            if payload.get("stream", True):
+                self._stream_answer(payload.get("model"), answer, state.delay)
+                return
+            start = time.perf_counter()
+            time.sleep(state.delay)
+            self._send_json(200, {
+                "model": payload.get("model"), "response": answer, "done": True,
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+            })
+        finally:
+            state.leave()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def _stream_answer(self, model, answer, delay):
+        """Satu baris JSON per token (Transfer-Encoding: chunked), lalu baris done"""
+        start = time.perf_counter()
+        tokens = TOKEN_PATTERN.findall(answer) or [""]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(delay / len(tokens))
+            line = {"model": model, "response": token, "done": False}
+            self._write_chunk(json.dumps(line, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.wfile.flush()
+        done = {"model": model, "response": "", "done": True,
+                "total_duration": int((time.perf_counter() - start) * 1e9)}
+        self._write_chunk(json.dumps(done).encode('utf-8') + b"\n")
+        self._write_chunk(b"")
+
+    def log_message(self, format, *args):
+        pass  # Jangan cetak setiap request
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0):
+        super().__init__(address, MockOllamaHandler)
+        self.state = MockState(delay)
+
+    def handle_error(self, request, client_address):
+        # Klien memutus stream di tengah jalan (mis. pemetaan dibatalkan) bukan error server
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_mock_server(host="127.0.0.1", port=0, delay=0.0):
+    """Jalankan server di thread latar; return server (URL: server.url, hentikan: server.shutdown())"""
+    server = MockOllamaServer((host, port), delay)
+    server.url = f"http://{host}:{server.server_address[1]}/api/generate"
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server tiruan Ollama untuk pengujian AIHandler")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.5, help="Latensi buatan per request (detik)")
+    args = parser.parse_args()
+
+    server = MockOllamaServer((args.host, args.port), args.delay)
+    print(f"[INFO] Mock Ollama di http://{args.host}:{args.port}/api/generate (delay {args.delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"[INFO] Selesai: {server.state.summary()}")
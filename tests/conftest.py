@@ -0,0 +1,11 @@
+import pytest
+
+import core.llm
+
+
+@pytest.fixture
+def llm_cache(tmp_path, monkeypatch):
+    """Cache LLM kosong per test (bukan temp_assets/llm_cache.sqlite milik repo)"""
+    cache = core.llm.LLMCache(str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setattr(core.llm, "get_llm_cache", lambda: cache)
+    return cache
@@ -0,0 +1,72 @@
+import pytest
+
+from core.ai_handler import CHAPTER_STRUCTURE, AIHandler
+from mock_ollama_server import start_mock_server
+
+TITLES = [title for subs in CHAPTER_STRUCTURE.values() for title in subs]
+EXPECTED = {bab: {sub: f"Isi {sub}" for sub in subs} for bab, subs in CHAPTER_STRUCTURE.items()}
+TEXT = "Manual ABPM 50. Peringatan keamanan. Spesifikasi daya 52VA."
+
+
+@pytest.fixture
+def server():
+    server = start_mock_server(port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_handler(server, **kwargs):
+    return AIHandler(url=server.url, model="mock", retrieval=False, max_concurrency=4, **kwargs)
+
+
+def check_events(events):
+    """Per sub-bab: event parsial (teks bertambah) lalu tepat satu event done terakhir"""
+    by_title = {}
+    for event in events:
+        assert set(event) == {"title", "text", "done", "seconds"}
+        by_title.setdefault(event["title"], []).append(event)
+    assert sorted(by_title) == sorted(TITLES)
+    for title, sequence in by_title.items():
+        *partials, last = sequence
+        assert last["done"] and last["text"] == f"Isi {title}"
+        assert not any(event["done"] for event in partials)
+        texts = [event["text"] for event in partials] + [last["text"]]
+        assert all(texts[i + 1].startswith(texts[i]) for i in range(len(texts) - 1))
+    return by_title
+
+
+def test_plain_mapping(server, llm_cache):
+    handler = make_handler(server)
+    assert handler.map_content_to_chapters(TEXT) == EXPECTED
+    assert server.state.summary()["requests"] == len(TITLES)
+    assert set(handler.last_timings) == set(TITLES)
+
+
+def test_streaming_mapping_sends_partial_then_done_events(server, llm_cache):
+    handler = make_handler(server)
+    events = []
+    assert handler.map_content_to_chapters(TEXT, on_update=events.append) == EXPECTED
+    by_title = check_events(events)
+    # Jawaban mock "Isi <judul>" di-stream per token: minimal satu event parsial per sub-bab
+    assert all(len(sequence) >= 2 for sequence in by_title.values())
+    assert set(handler.last_first_output) == set(TITLES)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_grouped_mapping_uses_one_prompt_per_group(server, llm_cache, stream):
+    handler = make_handler(server, chapters_per_prompt=3)
+    events = []
+    mapped = handler.map_content_to_chapters(TEXT, on_update=events.append if stream else None)
+
+    assert mapped == EXPECTED
+    assert server.state.summary()["requests"] == -(-len(TITLES) // 3)
+    if stream:
+        check_events(events)
+
+
+def test_cached_answers_skip_the_server(server, llm_cache):
+    make_handler(server).map_content_to_chapters(TEXT)
+    requests_after_first = server.state.summary()["requests"]
+    assert make_handler(server).map_content_to_chapters(TEXT) == EXPECTED
+    assert server.state.summary()["requests"] == requests_after_first
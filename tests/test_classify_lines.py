@@ -0,0 +1,124 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+from main_normalization import MY_SCHEMA_LABELS, SemanticNormalizer
+
+
+class StubEmbedder:
+    """Pengganti SentenceTransformer: vektor deterministik dari hash teks (tanpa unduh model)"""
+
+    def __init__(self, name=None):
+        self.encoded = []
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(32).astype(np.float32)
+
+    def encode(self, texts, batch_size=32, convert_to_tensor=False):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        self.encoded.append(len(batch))
+        vectors = np.stack([self._vector(text) for text in batch])
+        out = torch.from_numpy(vectors[0] if single else vectors)
+        return out if convert_to_tensor else out.numpy()
+
+
+def classify_line_reference(normalizer, clean_block, process_text):
+    """Logika per baris sebelum batching: hard match, lalu encode satu baris dan ambil
+    label skor tertinggi yang tidak ter-exclude"""
+    from sentence_transformers import util
+
+    for key, val in normalizer.labels.items():
+        if any(kw.lower() in clean_block.lower() for kw in val["keywords"]):
+            return key, 0.95
+    block_emb = normalizer.model.encode(process_text, convert_to_tensor=True)
+    scores = util.cos_sim(block_emb, normalizer.label_embeddings)[0]
+    for idx in torch.argsort(scores, descending=True):
+        key = normalizer.label_keys[idx.item()]
+        if not any(ex.lower() in clean_block.lower() for ex in normalizer.labels[key].get("exclude", [])):
+            return key, scores[idx].item()
+    return None, 0
+
+
+@pytest.fixture
+def make_normalizer(monkeypatch):
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", StubEmbedder)
+    return lambda schema=MY_SCHEMA_LABELS: SemanticNormalizer(schema)
+
+
+LINES = [
+    "1.2 Safety Guidelines",          # hard match
+    "PERINGATAN",                     # hard match (huruf besar)
+    "Garansi satu tahun",             # hard match 7.1, sekaligus exclude 1.4
+    "Bab XII Daftar Isi",             # semantic, 1.4 ter-exclude (Bab/XII)
+    "Bab 3 Ringkasan",                # semantic, 1.4 ter-exclude (Bab)
+    "IV. Pengoperasian alat",
+    "qwerty asdf",
+    "xyz",
+]
+
+
+def test_batched_classification_matches_per_line_scoring(make_normalizer):
+    normalizer = make_normalizer()
+    lines = [(line, normalizer.preprocess_line(line)) for line in LINES]
+
+    results = normalizer.classify_lines(lines)
+
+    # Semua baris tanpa hard match di-encode dalam satu batch
+    assert normalizer.model.encoded[-1] == normalizer.last_model_lines > 0
+    for (clean_block, process_text), (key, score) in zip(lines, results):
+        ref_key, ref_score = classify_line_reference(normalizer, clean_block, process_text)
+        assert key == ref_key, clean_block
+        assert score == pytest.approx(ref_score, abs=1e-5), clean_block
+
+
+def test_all_labels_excluded_gives_no_match(make_normalizer):
+    schema = {
+        "A": {"keywords": ["alfa"], "exclude": ["bab"]},
+        "B": {"keywords": ["beta"], "exclude": ["bab", "xii"]},
+    }
+    normalizer = make_normalizer(schema)
+    lines = [("Bab XII", "Bab XII"), ("Bab satu", "satu"), ("lain", "lain"), ("beta", "beta")]
+
+    results = normalizer.classify_lines(lines)
+
+    assert results[0] == (None, 0) and results[1] == (None, 0)
+    assert results[3] == ("B", 0.95)
+    for (clean_block, process_text), (key, score) in zip(lines, results):
+        ref_key, ref_score = classify_line_reference(normalizer, clean_block, process_text)
+        assert key == ref_key and score == pytest.approx(ref_score, abs=1e-5)
+
+
+def test_excluded_best_label_falls_back_to_next_label(make_normalizer):
+    schema = {
+        "A": {"keywords": ["alfa"], "exclude": ["lampiran"]},
+        "B": {"keywords": ["beta"], "exclude": []},
+        "C": {"keywords": ["gama"], "exclude": []},
+    }
+    normalizer = make_normalizer(schema)
+    # Teks untuk model sama persis dengan deskripsi label A ("A alfa") -> skor A = 1
+    lines = [("Lampiran", "A alfa"), ("Ringkasan", "A alfa")]
+
+    results = normalizer.classify_lines(lines)
+
+    assert results[1] == ("A", pytest.approx(1.0))
+    assert results[0][0] in ("B", "C") and results[0][1] < 1.0
+    ref_key, ref_score = classify_line_reference(normalizer, *lines[0])
+    assert results[0] == (ref_key, pytest.approx(ref_score, abs=1e-5))
+
+
+def test_semantic_mask_limits_model_lines(make_normalizer):
+    normalizer = make_normalizer()
+    lines = [(line, normalizer.preprocess_line(line)) for line in ["qwerty asdf", "xyz", "PERINGATAN"]]
+
+    results = normalizer.classify_lines(lines, semantic_mask=[False, True, True])
+
+    assert results[0] == (None, 0)
+    assert normalizer.last_model_lines == 1
+    assert results[1][0] == classify_line_reference(normalizer, *lines[1])[0]
+    assert results[2] == ("1.2 Panduan Keamanan", 0.95)
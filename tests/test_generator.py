@@ -0,0 +1,40 @@
+import json
+
+import fitz  # PyMuPDF
+
+from core.generator import document_chapters, generate_corpus
+
+
+def pdf_text(path):
+    with fitz.open(path) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+def test_nested_normalization_output_renders_content_only(tmp_path):
+    input_dir, output_dir = tmp_path / "data_output", tmp_path / "pdf"
+    (input_dir / "ASL_300").mkdir(parents=True)
+    document = {
+        "metadata": {"file_name": "manual_asl_300_id.pdf", "detected_language": "Indonesia"},
+        "content": {
+            "1.2 Panduan Keamanan": "Peringatan, harap untuk hati-hati.",
+            "6.1 Spesifikasi": "Daya 52VA sumber listrik.",
+        },
+        "detected_headings": {"1.2 Panduan Keamanan": ["Peringatan (Hal. 1)"]},
+    }
+    with open(input_dir / "ASL_300" / "manual_asl_300_id.json", 'w', encoding='utf-8') as f:
+        json.dump(document, f)
+
+    results = generate_corpus(input_dir, output_dir, workers=1)
+
+    assert [item.get("error") for item in results] == [None]
+    text = pdf_text(output_dir / "ASL_300" / "manual_asl_300_id.pdf")
+    assert "STANDARISASI: MANUAL_ASL_300_ID" in text
+    assert "1.2 Panduan Keamanan" in text and "Daya 52VA sumber listrik." in text
+    for key in ("metadata", "content", "detected_headings", "detected_language", "Hal. 1"):
+        assert key not in text
+
+
+def test_flat_document_is_used_as_is():
+    title, chapters = document_chapters({"7.1 Garansi": "Satu tahun."}, "manual_x_en")
+    assert title == "manual_x_en"
+    assert chapters == {"7.1 Garansi": "Satu tahun."}
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from core.keyword_matcher import KeywordMatcher
+from main_normalization import MY_SCHEMA_LABELS
+
+
+def substring_masks(schema, line):
+    """Cara lama: any(kw.lower() in line.lower()) per label, dijadikan bitmask urutan schema"""
+    keyword_mask = exclude_mask = 0
+    for idx, value in enumerate(schema.values()):
+        if isinstance(value, dict):
+            keywords, excludes = value.get("keywords", []), value.get("exclude", [])
+        else:
+            keywords, excludes = value, []
+        if any(kw.lower() in line.lower() for kw in keywords):
+            keyword_mask |= 1 << idx
+        if any(ex.lower() in line.lower() for ex in excludes):
+            exclude_mask |= 1 << idx
+    return keyword_mask, exclude_mask
+
+def first_label_substring(schema, line):
+    for key, value in schema.items():
+        if any(kw.lower() in line.lower() for kw in value["keywords"]):
+            return key
+    return None
+
+
+def schema_lines(schema, rng, count):
+    """Baris berisi potongan keyword/exclude schema (utuh, terpotong, berimpit) di antara kata lain"""
+    words = [word for value in schema.values() for word in value["keywords"] + value["exclude"]]
+    filler = ["manual", "alat", "Bab", "halaman", "the", "of", "1.2", "XIV", "-", "spesifik", "SAFETY"]
+    lines = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 5)):
+            word = rng.choice(words + filler)
+            if rng.random() < 0.3:
+                cut = rng.randint(1, len(word))
+                word = word[:cut] if rng.random() < 0.5 else word[cut - 1:]
+            if rng.random() < 0.3:
+                word = word.upper()
+            parts.append(word)
+        lines.append(rng.choice(["", " ", ": "]).join(parts))
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_schema_matches_substring_logic(seed):
+    matcher = KeywordMatcher(MY_SCHEMA_LABELS)
+    for line in schema_lines(MY_SCHEMA_LABELS, random.Random(seed), 400):
+        assert matcher.scan(line) == substring_masks(MY_SCHEMA_LABELS, line), line
+        assert matcher.match(line) == first_label_substring(MY_SCHEMA_LABELS, line), line
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_overlapping_keywords_match_substring_logic(seed):
+    # Alfabet kecil -> keyword saling berimpit, prefiks/sufiks satu sama lain, dan berulang;
+    # "İ" jadi dua karakter saat lower(), sama untuk keyword maupun baris
+    rng = random.Random(seed)
+    alphabet = "abAİi̇ "
+    schema = {}
+    for idx in range(rng.randint(1, 8)):
+        keywords = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 4))]
+        excludes = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(0, 2))]
+        schema[f"label_{idx}"] = {"keywords": keywords, "exclude": excludes}
+    matcher = KeywordMatcher(schema)
+    for _ in range(200):
+        line = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        assert matcher.scan(line) == substring_masks(schema, line), (schema, line)
+        assert matcher.match(line) == first_label_substring(schema, line), (schema, line)
+
+
+def test_overlapping_and_nested_keywords():
+    schema = {"a": ["she", "hers"], "b": ["he"], "c": ["his"], "d": {"keywords": ["x"], "exclude": ["s"]}}
+    matcher = KeywordMatcher(schema)
+    for line in ["ushers", "ahishers", "HE", "sh", "hi s", ""]:
+        assert matcher.scan(line) == substring_masks(schema, line), line
+    assert matcher.match("ushers") == "a"
+    assert matcher.mask_to_flags(matcher.scan("ahishers")[0]) == [True, True, True, False]
+
+
+def test_list_schema_and_empty_keyword():
+    schema = {"kosong": [""], "lain": ["abc"]}
+    matcher = KeywordMatcher(schema)
+    # Keyword kosong selalu cocok, sama seperti `"" in line`
+    assert matcher.scan("apa saja") == substring_masks(schema, "apa saja") == (1, 0)
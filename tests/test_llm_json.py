@@ -0,0 +1,58 @@
+import pytest
+
+from core.llm import IncrementalJSON, parse_partial_json, strip_code_fences
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Belum ada JSON
+    ("", None),
+    ("teks tanpa json", None),
+    ("{", {}),
+    # Key terpotong / key tanpa nilai dibuang
+    ('{"jud', {}),
+    ('{"judul"', {}),
+    ('{"judul":', {}),
+    ('{"judul": "Manual", "is', {"judul": "Manual"}),
+    ('{"judul": "Manual", "isi":', {"judul": "Manual"}),
+    # String nilai terpotong ikut sebagai isi parsial (escape yang belum lengkap dibuang)
+    ('{"judul": "Ma', {"judul": "Ma"}),
+    ('{"a": "baris\\', {"a": "baris"}),
+    ('{"a": "suhu 37\\u00', {"a": "suhu 37"}),
+    ('{"a": "kurung } dan ] di dalam string', {"a": "kurung } dan ] di dalam string"}),
+    # Literal/angka terpotong dibuang, yang sudah utuh dipertahankan
+    ('{"a": tr', {}),
+    ('{"a": true', {"a": True}),
+    ('{"a": 1.', {}),
+    ('{"a": nul', {}),
+    ('{"a": 1,', {"a": 1}),
+    # Objek & list bersarang ditutup sesuai urutan pembukanya
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ('{"a": {"b": [1, 2,', {"a": {"b": [1, 2]}}),
+    ('{"a": {"b": [{"c": "d', {"a": {"b": [{"c": "d"}]}}),
+    ('[{"a": 1}, {"b"', [{"a": 1}, {}]),
+    # Teks di luar JSON & code fence
+    ('Berikut JSON: {"a": 1} selesai', {"a": 1}),
+    ('```json\n{"judul": "Manual", "isi": ["a', {"judul": "Manual", "isi": ["a"]}),
+    ('```json\n{"judul": "Manual"}\n```', {"judul": "Manual"}),
+])
+def test_parse_partial_json(text, expected):
+    assert parse_partial_json(text) == expected
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    (['```json\n{"ju', 'dul": "Man', 'ual", "isi": ["a"', ', "b"]}\n```'],
+     [{}, {"judul": "Man"}, {"judul": "Manual", "isi": ["a"]}, {"judul": "Manual", "isi": ["a", "b"]}]),
+    # Potongan yang belum bisa di-parse mempertahankan hasil terbaik sebelumnya
+    (['Berikut', ' hasilnya: ', '{"a": {"b": 1', '}, "c": tr', 'ue}'],
+     [None, None, {"a": {"b": 1}}, {"a": {"b": 1}}, {"a": {"b": 1}, "c": True}]),
+])
+def test_incremental_json(chunks, expected):
+    parser = IncrementalJSON()
+    assert [parser.feed(chunk) for chunk in chunks] == expected
+
+
+def test_incremental_json_full_text_is_unfenced():
+    parser = IncrementalJSON()
+    for chunk in ['```json\n{"a": ', '"b"}\n```']:
+        parser.feed(chunk)
+    assert parser.text == '{"a": "b"}' == strip_code_fences(parser.raw)
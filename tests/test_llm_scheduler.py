@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from core.llm_scheduler import BATCH, INTERACTIVE, LLMScheduler, MockBackend, TokenBucket
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout menunggu kondisi"
+        time.sleep(0.005)
+
+
+def test_interactive_requests_are_served_before_queued_batch():
+    scheduler = LLMScheduler(backoff_base=0.001)
+    scheduler.configure("mock", concurrency=1, rpm=0, tpm=0)
+    release, finished = threading.Event(), []
+
+    def job(label, priority):
+        scheduler.call("mock", lambda: finished.append(label), priority)
+
+    # Permit satu-satunya dipegang sampai semua request sudah mengantre
+    blocker = threading.Thread(target=scheduler.call, args=("mock", release.wait, BATCH))
+    blocker.start()
+    wait_until(lambda: scheduler.stats()["backends"]["mock"]["in_flight"] == 1)
+    threads = []
+    for label, priority in [("batch-0", BATCH), ("batch-1", BATCH), ("batch-2", BATCH),
+                            ("interactive-0", INTERACTIVE), ("interactive-1", INTERACTIVE)]:
+        thread = threading.Thread(target=job, args=(label, priority))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.stats()["backends"]["mock"]["queued"] == len(threads))
+    release.set()
+    for thread in [blocker] + threads:
+        thread.join(5)
+
+    assert finished == ["interactive-0", "interactive-1", "batch-0", "batch-1", "batch-2"]
+
+
+def test_transient_errors_are_retried_with_backoff():
+    scheduler = LLMScheduler(backoff_base=0.001)
+    scheduler.configure("mock", concurrency=2, rpm=0, tpm=0, retries=3)
+    backend = MockBackend(latency=0.0, failures=2)
+
+    assert scheduler.call("mock", lambda: backend("halo")) == "mock: halo"
+    assert backend.calls == 3
+    counters = scheduler.stats()["counters"]
+    assert counters["mock.retries"] == 2 and "mock.failed" not in counters
+
+
+def test_gives_up_after_retries_and_on_permanent_errors():
+    scheduler = LLMScheduler(backoff_base=0.001)
+    scheduler.configure("mock", retries=1)
+    backend = MockBackend(latency=0.0, failures=5)
+    with pytest.raises(Exception, match="429"):
+        scheduler.call("mock", lambda: backend("x"))
+    assert backend.calls == 2
+
+    calls = []
+    def broken():
+        calls.append(1)
+        raise ValueError("prompt tidak valid")
+    with pytest.raises(ValueError):
+        scheduler.call("mock", broken)
+    assert len(calls) == 1
+    assert scheduler.stats()["counters"]["mock.failed"] == 2
+
+
+def test_rpm_bucket_spaces_requests():
+    scheduler = LLMScheduler(backoff_base=0.001)
+    scheduler.configure("mock", concurrency=4, rpm=600, tpm=0)  # 10 request/detik, burst 1
+    backend = MockBackend(latency=0.0)
+
+    start = time.perf_counter()
+    for index in range(4):
+        scheduler.call("mock", lambda: backend(str(index)))
+    elapsed = time.perf_counter() - start
+
+    assert backend.calls == 4
+    assert elapsed >= 0.25
+    assert scheduler.stats()["counters"]["mock.rate_limited"] == 3
+
+
+def test_rate_limited_request_does_not_hold_a_permit():
+    scheduler = LLMScheduler(backoff_base=0.001)
+    scheduler.configure("mock", concurrency=1, rpm=60, tpm=0)  # 1 request/detik
+    scheduler.call("mock", lambda: None)
+
+    waiter = threading.Thread(target=scheduler.call, args=("mock", lambda: None, BATCH))
+    waiter.start()
+    time.sleep(0.1)
+    # Request kedua sedang menunggu bucket, tetapi permit backend tetap bebas
+    assert scheduler.stats()["backends"]["mock"]["in_flight"] == 0
+    waiter.join(5)
+    assert not waiter.is_alive()
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=1200, burst=2)  # 20 token/detik
+    assert bucket.acquire(2) == 0.0
+    assert bucket.acquire(1) == pytest.approx(0.05, abs=0.03)
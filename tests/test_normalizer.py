@@ -0,0 +1,54 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from core.normalizer import normalize_document, split_into_chunks, stub_backend
+
+# Header halaman berulang di setiap halaman; "1.1 Peringatan" & "6.1 Spesifikasi" berlanjut ke halaman berikutnya
+PAGES = [
+    "ABPM 50 Manual\nBAB 1 Keamanan\n1.1 Peringatan\nJangan terkena air.",
+    "ABPM 50 Manual\n1.1 Peringatan\nLepas baterai sebelum dibersihkan.",
+    "ABPM 50 Manual\nBAB 6 Spesifikasi\n6.1 Spesifikasi\nDaya 52VA.",
+    "ABPM 50 Manual\n6.1 Spesifikasi\nBerat 120 g.",
+]
+EXPECTED = {
+    "judul_dokumen": "ABPM 50 Manual",
+    "isi_materi": ["BAB 1 Keamanan", "1.1 Peringatan", "Jangan terkena air.", "Lepas baterai sebelum dibersihkan.",
+                   "BAB 6 Spesifikasi", "6.1 Spesifikasi", "Daya 52VA.", "Berat 120 g."],
+}
+
+
+def slow_first_chunks(total):
+    """Stub yang menjawab chunk awal paling lambat: urutan selesai terbalik dari urutan chunk"""
+    stub = stub_backend()
+
+    def call(prompt):
+        part = int(prompt.split("This is part ", 1)[1].split(" ", 1)[0])
+        time.sleep(0.02 * (total - part))
+        return stub(prompt)
+    return call
+
+
+def test_multi_chunk_document_merges_in_chunk_order():
+    max_chars = max(len(page) for page in PAGES) + 1
+    assert len(split_into_chunks(PAGES, max_chars)) == len(PAGES)
+
+    data, report = normalize_document(PAGES, slow_first_chunks(len(PAGES)), max_chars=max_chars,
+                                      workers=4, return_report=True)
+
+    assert report["failed"] == 0 and [entry["chunk"] for entry in report["chunks"]] == [0, 1, 2, 3]
+    # Judul bagian yang berulang di chunk berikutnya hanya muncul sekali, urut chunk (bukan urut selesai)
+    assert data == EXPECTED
+
+
+def test_output_is_identical_across_runs_and_worker_counts():
+    text = "\f".join(PAGES)
+    max_chars = max(len(page) for page in PAGES) + 1
+    runs = [json.dumps(normalize_document(text, slow_first_chunks(len(PAGES)), max_chars=max_chars,
+                                          workers=workers), ensure_ascii=False)
+            for workers in (4, 4, 1)]
+    assert runs[0] == runs[1] == runs[2]
+    assert json.loads(runs[0]) == EXPECTED
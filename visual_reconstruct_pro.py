@@ -3,17 +3,18 @@ import fitz  # PyMuPDF
 import os
 import re
 import io
-import torch
 import json
 from pathlib import Path
 from docx import Document
 from docx.shared import Inches
 from docx.enum.table import WD_ALIGN_VERTICAL
 from PIL import Image
-from sentence_transformers import SentenceTransformer, util
-from langdetect import detect, DetectorFactory
+from core.cell_index import index_tables
+from core.keyword_matcher import KeywordMatcher
+from core.metrics import Metrics, configure_logging, get_logger
+from core.pictogram_cache import get_pictogram_cache
 
-DetectorFactory.seed = 0
+log = get_logger("visual")
 
 # ==========================================
 # 1. KONFIGURASI TRANSLASI & SKEMA
@@ -138,14 +139,15 @@ MY_SCHEMA_LABELS = {
 }
 
 class VisualNormalizer:
-    def __init__(self, schema):
-        print("Memuat Model AI...")
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+    def __init__(self, schema, pictogram_cache=None):
         self.schema = schema
         self.label_keys = list(schema.keys())
-        desc = [f"{k} " + " ".join(v["keywords"]) for k, v in schema.items()]
-        self.embeddings = self.model.encode(desc, convert_to_tensor=True)
+        self.matcher = KeywordMatcher(schema)
         self.threshold = 0.55
+        self.metrics = Metrics()
+        # Cache piktogram lintas manual (None = cache bersama, dibuka saat crop pertama; False = selalu render ulang)
+        self.use_pictogram_cache = pictogram_cache is not False
+        self.pictograms = pictogram_cache or None
 
     def is_garbage(self, text):
         """Membuang fragmen teks vertikal yang berantakan """
@@ -154,11 +156,23 @@ class VisualNormalizer:
         if clean.count(' ') > (len(clean) / 2): return True
         return False
 
-    def crop_high_res(self, page_fitz, bbox, zoom=4):
-        """Mencrop area simbol dan menjernihkannya (DPI Tinggi)"""
+    def render_crop(self, page_fitz, bbox, zoom=4):
+        """Render PNG area simbol dengan DPI tinggi"""
         mat = fitz.Matrix(zoom, zoom)
         pix = page_fitz.get_pixmap(matrix=mat, clip=bbox)
-        return io.BytesIO(pix.tobytes("png"))
+        return pix.tobytes("png")
+
+    def crop_high_res(self, page_fitz, bbox, zoom=4):
+        """Mencrop area simbol dan menjernihkannya (DPI Tinggi); simbol yang sudah pernah
+        dirender (hash visual sama) diambil dari cache piktogram"""
+        if not self.use_pictogram_cache:
+            return io.BytesIO(self.render_crop(page_fitz, bbox, zoom))
+        if self.pictograms is None:
+            self.pictograms = get_pictogram_cache()
+        hits_before = self.pictograms.stats["hits"]
+        png = self.pictograms.get_or_render(page_fitz, bbox, zoom, self.render_crop)
+        self.metrics.incr("pictogram_hits" if self.pictograms.stats["hits"] > hits_before else "pictogram_renders")
+        return io.BytesIO(png)
 
     def process_to_word(self, pdf_path, output_docx):
         lang_detected = "Indonesia" if "id" in pdf_path.name.lower() else "English"
@@ -168,24 +182,25 @@ class VisualNormalizer:
         doc.add_heading(f'Normalisasi Visual: {pdf_path.name}', 0)
         
         pdf_fitz = fitz.open(pdf_path)
+        picto_before = {name: self.metrics.counters.get(name, 0) for name in ("pictogram_hits", "pictogram_renders")}
         added_headings = set()
         current_section = None
 
-        with pdfplumber.open(pdf_path) as pdf_plumb:
+        with self.metrics.timer("document"), pdfplumber.open(pdf_path) as pdf_plumb:
             for i, page_plumb in enumerate(pdf_plumb.pages):
-                print(f"  Menganalisis Halaman {i+1}...")
+                log.debug(f"  Menganalisis Halaman {i+1}...")
+                self.metrics.incr("pages")
                 page_fitz = pdf_fitz[i]
                 
                 # 1. Deteksi Judul via AI & Hard Match
-                lines = page_plumb.extract_text().split('\n') if page_plumb.extract_text() else []
+                page_text = page_plumb.extract_text()
+                lines = page_text.split('\n') if page_text else []
+                self.metrics.incr("lines_seen", len(lines))
                 for line in lines:
                     if self.is_garbage(line): continue
                     
                     # Logika Matching
-                    matched = None
-                    for k, v in self.schema.items():
-                        if any(kw.lower() in line.lower() for kw in v["keywords"]):
-                            matched = k; break
+                    matched = self.matcher.match(line)
                     
                     if matched and matched not in added_headings:
                         current_section = matched
@@ -197,6 +212,8 @@ class VisualNormalizer:
 
                 # 2. Tabel & Simbol (Cropping Visual)
                 tables = page_plumb.find_tables()
+                # Semua sel dari semua tabel diisi dari satu kali lewat karakter halaman
+                cell_index = index_tables(page_plumb, tables) if tables else None
                 for table_obj in tables:
                     rows = table_obj.rows
                     if not rows: continue
@@ -222,18 +239,22 @@ class VisualNormalizer:
                                     run = w_cell.paragraphs[0].add_run()
                                     run.add_picture(img_stream, width=Inches(0.40))
                                 except Exception as e:
-                                    print(f"      Gagal crop simbol: {e}")
+                                    log.warning(f"      Gagal crop simbol: {e}")
                             else:
                                 # Ekstrak teks untuk kolom keterangan/arti
-                                cell_text = page_plumb.within_bbox(cell_bbox).extract_text()
-                                w_cell.text = cell_text if cell_text else ""
+                                w_cell.text = cell_index.text(cell_bbox)
                             
                             w_cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
 
         doc.save(output_docx)
-        print(f"--- Selesai: {output_docx} ---")
+        hits = self.metrics.counters.get("pictogram_hits", 0) - picto_before["pictogram_hits"]
+        renders = self.metrics.counters.get("pictogram_renders", 0) - picto_before["pictogram_renders"]
+        if hits or renders:
+            log.info(f"    Piktogram: {hits} dari cache, {renders} dirender")
+        log.info(f"--- Selesai: {output_docx} ---")
 
 if __name__ == "__main__":
+    configure_logging()
     folder_in = Path(r"data_input\FOX_BABY")
     targets = ["manual_fox_baby_en.pdf", "manual_fox_baby_id.pdf"]
     recon = VisualNormalizer(MY_SCHEMA_LABELS)
@@ -242,4 +263,6 @@ if __name__ == "__main__":
         path = folder_in / target
         if path.exists():
             out = f"data_output/VISUAL_RECON_{path.stem}.docx"
-            recon.process_to_word(path, out)
\ No newline at end of file
+            recon.process_to_word(path, out)
+    if recon.pictograms:
+        log.info(f"Cache piktogram: {recon.pictograms.summary()}")
\ No newline at end of file